@@ -0,0 +1,126 @@
+""" Times the stages of the header to pxd pipeline of the clang frontend
+on synthetic headers.
+
+usage: python bench/bench_pipeline.py [--sizes 1000 10000 100000]
+           [--language c++] [--repeat 3] [--memory]
+
+For every size the best time of each stage over `--repeat` runs is
+reported together with the throughput in declarations per second. With
+`--memory` every stage is run once more under tracemalloc to report the
+peak memory it allocated.
+
+"""
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from cwrap.backend import renderer
+from cwrap.frontends.clang import ast_transforms, clang_parser
+from cwrap.frontends.clang.clang import cindex
+
+import synthetic
+
+
+STAGES = ['parse', 'get_result', 'c_ast_transformations', 'transform',
+          'render']
+
+
+def run_pipeline(path, language, index):
+    """ Runs the pipeline on the header at `path`. Yields the name of
+    each stage before running it.
+
+    """
+    parser = clang_parser.ClangParser()
+    yield 'parse'
+    parser.parse(path, [], language, index=index)
+    yield 'get_result'
+    items = parser.get_result()
+    yield 'c_ast_transformations'
+    trans_items = ast_transforms.apply_c_ast_transformations(items)
+    container = ast_transforms.CAstContainer(trans_items, 'bench.h',
+                                             '_bench', 'bench')
+    yield 'transform'
+    ast_container, = ast_transforms.CAstTransformer([container]).transform()
+    yield 'render'
+    renderer.ASTRenderer().render(ast_container.module)
+
+
+def time_stages(path, language, index):
+    times = {}
+    stage = None
+    start = time.perf_counter()
+    for next_stage in run_pipeline(path, language, index):
+        now = time.perf_counter()
+        if stage is not None:
+            times[stage] = now - start
+        stage, start = next_stage, now
+    times[stage] = time.perf_counter() - start
+    return times
+
+
+def trace_stages(path, language, index):
+    peaks = {}
+    stage = None
+    tracemalloc.start()
+    try:
+        for next_stage in run_pipeline(path, language, index):
+            if stage is not None:
+                peaks[stage] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+            stage = next_stage
+        peaks[stage] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def bench(n_decls, language, repeat, memory):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'bench.h')
+        synthetic.write_header(path, n_decls, language == 'c++')
+        index = cindex.Index.create()
+
+        best = {}
+        for i in range(repeat):
+            for stage, t in time_stages(path, language, index).items():
+                best[stage] = min(t, best.get(stage, t))
+        peaks = trace_stages(path, language, index) if memory else {}
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print('%d declarations (%s)' % (n_decls, language or 'c'))
+    for stage in STAGES + ['total']:
+        t = best[stage] if stage != 'total' else sum(best.values())
+        line = '  %-22s %9.3f s %12.0f decl/s' % (stage, t, n_decls / t)
+        if stage in peaks:
+            line += ' %10.1f MiB peak' % (peaks[stage] / 2.0**20)
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 100000])
+    parser.add_argument('--language', default='',
+                        help='passed as -x to clang, c++ adds classes')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--memory', action='store_true',
+                        help='report the peak memory of every stage')
+    args = parser.parse_args(argv)
+
+    for n_decls in args.sizes:
+        bench(n_decls, args.language, args.repeat, args.memory)
+    print('max rss %.1f MiB' %
+          (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+""" Times the startup of cwrap, which dominates when it runs once per
+header in make-style builds.
+
+usage: python bench/bench_startup.py [--repeat 20] [--budget 60]
+
+Every stage runs in a fresh interpreter, the best time over `--repeat`
+runs is reported without the startup of the interpreter itself:
+
+* import: importing the command line (what every cwrap run pays)
+* first parse: importing the clang frontend, loading libclang and
+  parsing a one line header
+
+With `--budget` (milliseconds) the exit status is 1 if the import
+stage takes longer.
+
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+STAGES = [
+    ('interpreter', 'pass'),
+    ('import', 'import cwrap.cli'),
+    ('first parse',
+     'from cwrap.frontends.clang import clang_parser\n'
+     'clang_parser.parse([("t.h", "int f(int);")], [], "")'),
+]
+
+
+def time_code(code, repeat):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', code], env=env)
+        t = time.perf_counter() - start
+        best = t if best is None else min(t, best)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--budget', type=float, default=None,
+                        help='milliseconds the import may take')
+    args = parser.parse_args(argv)
+
+    times = dict((stage, time_code(code, args.repeat))
+                 for stage, code in STAGES)
+    base = times.pop('interpreter')
+    print('interpreter startup %9.1f ms' % (base * 1000))
+    for stage, code in STAGES[1:]:
+        print('  %-17s %9.1f ms' % (stage, (times[stage] - base) * 1000))
+
+    if args.budget is not None and \
+            (times['import'] - base) * 1000 > args.budget:
+        print('import takes longer than the budget of %.1f ms' % args.budget)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+""" Generates synthetic headers for the benchmarks.
+
+The declarations cycle through the constructs cwrap has to deal with:
+enums, typedef'd callbacks, structs with a nested union, functions
+using them and (for C++) classes with methods.
+
+"""
+
+C_TEMPLATES = [
+    'enum e_{i} {{ E_{i}_A, E_{i}_B = {i}, E_{i}_C }};\n',
+
+    'typedef int (*cb_{i}_t)(int value, void *data);\n',
+
+    'struct s_{i} {{\n'
+    '    int id;\n'
+    '    const char *name;\n'
+    '    union {{ int ival; double dval; }} value;\n'
+    '    struct s_{i} *next;\n'
+    '    int (*cb)(int value, void *data);\n'
+    '}};\n',
+
+    'int f_{i}(struct s_{prev} *s, unsigned long n, const char *name);\n',
+]
+
+CXX_TEMPLATES = [
+    'class C_{i} {{\n'
+    'public:\n'
+    '    C_{i}(int x);\n'
+    '    int get(int idx) const;\n'
+    '    void set(int idx, double value);\n'
+    '    int size;\n'
+    '}};\n',
+]
+
+
+def generate_header(n_decls, cplusplus=False):
+    """ Returns the source of a header with `n_decls` declarations.
+    C++ classes are only added if `cplusplus` is True.
+
+    """
+    templates = C_TEMPLATES + (CXX_TEMPLATES if cplusplus else [])
+    parts = ['#ifndef BENCH_H\n#define BENCH_H\n\n']
+    for i in range(n_decls):
+        # functions take the struct declared right before them
+        parts.append(templates[i % len(templates)].format(i=i, prev=i-1))
+    parts.append('\n#endif\n')
+    return ''.join(parts)
+
+
+def write_header(path, n_decls, cplusplus=False):
+    with open(path, 'w') as f:
+        f.write(generate_header(n_decls, cplusplus))
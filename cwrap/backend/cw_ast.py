@@ -168,6 +168,13 @@ class CWAN(object):
     def init(self, *args, **kwargs):
         pass
 
+    def __reduce_ex__(self, protocol):
+        # Singleton nodes (e.g. `Pass`, `Param`) replace their class in
+        # this module. Pickle them by name so they stay singletons.
+        if globals().get(self.__class__.__name__) is self:
+            return self.__class__.__name__
+        return super(CWAN, self).__reduce_ex__(protocol)
+
 
 #------------------------------------------------------------------------------
 # Python AST nodes (closely mimic the builtin ast module nodes)
@@ -1423,14 +1430,17 @@ class ExternFrom(stmt):
     """ An extern from declaration. Inherits stmt.
 
     name : a string
-    body : a list of stmt nodes.
+    body : a list of stmt nodes or an iterator over them, which is
+           consumed when the node is rendered.
 
     """
     def init(self, name, body):
         if isinstance(name, bytes):
             name = name.decode()
         assert_str(name, 'name')
-        assert_stmts(body, 'body')
+        # checking an iterator would consume it
+        if isinstance(body, list):
+            assert_stmts(body, 'body')
         self.name = name
         self.body = body
 
@@ -4,6 +4,7 @@ import os
 
 from . import cw_ast
 from .. import version
+from ..dispatch import Visitor
 
 
 UNDEFINED = '__UNDEFINED__'
@@ -16,9 +17,13 @@ CODE_HEADER = """\
 
 
 class Code(object):
+    """ Writes the code to the text stream `stream`, a StringIO buffer
+    if it's None.
 
-    def __init__(self):
-        self._io = StringIO()
+    """
+    def __init__(self, stream=None):
+        self._io = stream if stream is not None else StringIO()
+        self._io.write(CODE_HEADER)
         self._indent_level = 0
         self._indentor = ' ' * 4
 
@@ -41,11 +46,15 @@ class Code(object):
         self._io.write('\n' * n)
     
     def getvalue(self):
-        res = CODE_HEADER + self._io.getvalue()
-        return res
+        return self._io.getvalue()
+
 
+class ASTRenderer(Visitor):
 
-class ASTRenderer(object):
+    dispatch_tables = {
+        '_visitors': ('visit_', 'unhandled_visitor'),
+        '_renderers': ('render_', 'unhandled_renderer'),
+    }
 
     def __init__(self):
         self.code = None
@@ -55,24 +64,32 @@ class ASTRenderer(object):
     # Dispatch methods
     #--------------------------------------------------------------------------
     def render(self, module):
+        """ Returns the code for `module` as a string.
+
+        """
+        stream = StringIO()
+        self.render_to(module, stream)
+        return stream.getvalue()
+
+    def render_to(self, module, stream):
+        """ Writes the code for `module` to the writable text stream
+        `stream`. The statements are written as they are visited, so
+        the code is never held in memory as a whole.
+
+        """
         if not isinstance(module, cw_ast.Module):
             msg = ('.render(...) must be called with a Module node as ' 
                    'argument. Got `%s` instead.' % type(module))
             raise TypeError(msg)
-        self.code = Code()
+        self.code = Code(stream)
         self.cdef_stmt_context = []
         self.visit(module)
-        return self.code.getvalue()
 
     def visit(self, node):
-        method_name = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, method_name, self.unhandled_visitor)
-        visitor(node)
+        self._visitors[node.__class__](self, node)
 
     def visit_render(self, node):
-        method_name = 'render_' + node.__class__.__name__
-        renderer = getattr(self, method_name, self.unhandled_renderer)
-        return renderer(node)
+        return self._renderers[node.__class__](self, node)
 
     def unhandled_visitor(self, node):
         print('No visitor for node: `%s`' % node)
@@ -0,0 +1,171 @@
+""" The cwrap command line.
+
+    cwrap [-i include-dir]... [-x language] [--socket path | --watch]
+          header output
+    cwrap serve [--socket path] [-v]
+    cwrap batch -p build-dir [-o output-dir] [-j jobs] [-v] header...
+
+The first form generates the pxd file `output` for `header`, which is
+searched in the include dirs like ``#include <header>``. With
+``--socket`` it asks the cwrap server listening there to do it, and
+generates it itself if no server is running. With ``--watch`` it keeps
+running and generates the file again whenever the header or a file it
+includes changes (see the watch module). The second form runs the
+server (see the server module). The third form generates the pxd files
+of the header paths, parsing them with the flags of the
+compile_commands.json in the build dir (see the compdb module).
+
+"""
+# Stdlib imports
+import argparse
+import os
+import sys
+
+# Local package imports
+from . import log
+from .config import Config, File
+
+
+def generate(header, output, include_dirs, language):
+    """ Generates the pxd file `output` for `header` in this process.
+
+    """
+    # imported here, the client doesn't need libclang
+    from .backend import renderer
+    from .frontends.clang import ast_transforms, clang_parser
+
+    inputfile = '#include <' + header + '>'
+
+    ast_items = clang_parser.parse([('input.h', inputfile)], include_dirs,
+                                   language)
+    trans_items = ast_transforms.apply_c_ast_transformations(ast_items)
+    container = ast_transforms.CAstContainer(trans_items, header,
+                                             output, None)
+
+    ast_transformer = ast_transforms.CAstTransformer([container])
+    # There's only a single container
+    ast = next(ast_transformer.transform()).module
+
+    ast_renderer = renderer.ASTRenderer()
+    with open(output, 'w') as f:
+        ast_renderer.render_to(ast, f)
+
+
+def watch(header, output, include_dirs, language, verbose):
+    """ Generates the pxd file `output` for `header` whenever one of
+    its inputs changes, until interrupted.
+
+    """
+    from . import server
+    from .watch import Watcher
+
+    header_file, save_dir = server.header_file(
+        server.find_header(header, include_dirs), header, output)
+    config = Config('clang', [header_file], save_dir,
+                    include_dirs=include_dirs, language=language,
+                    verbose=verbose)
+    try:
+        Watcher(config).run()
+    except KeyboardInterrupt:
+        pass
+
+
+def generate_main(argv):
+    parser = argparse.ArgumentParser(
+        prog='cwrap', description='Generates the Cython declarations '
+        'for a C header file.',
+        epilog='example: cwrap -i ~/mycode/inc libme/me.h me.pxd')
+    parser.add_argument('-i', '--include', dest='include_dirs',
+                        action='append', default=[], metavar='include-dir')
+    parser.add_argument('-x', '--language', default='')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--socket', help='generate with the cwrap server '
+                      'listening on this socket, if there is one')
+    mode.add_argument('--watch', action='store_true',
+                      help='generate again whenever the inputs change')
+    parser.add_argument('-v', '--verbose', action='count', default=0)
+    parser.add_argument('header', metavar='header-name')
+    parser.add_argument('output', metavar='output-file')
+    args = parser.parse_args(argv)
+    log.set_verbosity(args.verbose)
+
+    if args.socket is not None:
+        from . import server
+        try:
+            server.request(args.socket, args.header, args.output,
+                           args.include_dirs, args.language)
+            return 0
+        except server.ServerError as e:
+            print('cwrap: %s' % e, file=sys.stderr)
+            return 1
+        except OSError:
+            # no server running
+            pass
+
+    if args.watch:
+        # report every generation
+        watch(args.header, args.output, args.include_dirs, args.language,
+              max(args.verbose, 1))
+        return 0
+
+    generate(args.header, args.output, args.include_dirs, args.language)
+    return 0
+
+
+def serve_main(argv):
+    from . import server
+
+    parser = argparse.ArgumentParser(
+        prog='cwrap serve', description='Serves generate requests.')
+    parser.add_argument('--socket', default=server.DEFAULT_SOCKET)
+    parser.add_argument('-v', '--verbose', action='count', default=0)
+    args = parser.parse_args(argv)
+
+    log.set_verbosity(args.verbose)
+    try:
+        server.serve(args.socket, verbose=args.verbose)
+    except server.ServerError as e:
+        print('cwrap: %s' % e, file=sys.stderr)
+        return 1
+    return 0
+
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(
+        prog='cwrap batch', description='Generates the Cython '
+        'declarations for C header files with the flags of a compilation '
+        'database.',
+        epilog='example: cwrap batch -p build -o pxd inc/me.h inc/you.h')
+    parser.add_argument('-p', '--build-dir', required=True,
+                        help='compile_commands.json or its directory')
+    parser.add_argument('-o', '--output-dir', default=None)
+    parser.add_argument('-i', '--include', dest='include_dirs',
+                        action='append', default=[], metavar='include-dir')
+    parser.add_argument('-x', '--language', default='')
+    parser.add_argument('-j', '--jobs', type=int, default=1)
+    parser.add_argument('--incremental', action='store_true',
+                        help='only generate the files whose inputs changed')
+    parser.add_argument('--macros', action='store_true',
+                        help='declare the #define constants too')
+    parser.add_argument('-v', '--verbose', action='count', default=0)
+    parser.add_argument('headers', nargs='+', metavar='header')
+    args = parser.parse_args(argv)
+
+    files = [File(os.path.abspath(header)) for header in args.headers]
+    config = Config('clang', files, args.output_dir,
+                    compile_commands=os.path.abspath(args.build_dir),
+                    include_dirs=args.include_dirs, language=args.language,
+                    jobs=args.jobs, incremental=args.incremental,
+                    macros=args.macros, verbose=args.verbose)
+    config.generate()
+    return 0
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ['serve']:
+        return serve_main(argv[1:])
+    if argv[:1] == ['batch']:
+        return batch_main(argv[1:])
+    return generate_main(argv)
@@ -1,14 +1,26 @@
+import hashlib
 import os
 
 from . import frontends
-from .backend import renderer
+from . import log
+
+
+logger = log.get_logger(__name__)
+
+
+# Options that don't change the generated code
+RUNTIME_OPTIONS = ('cache_dir', 'jobs', 'verbose', 'incremental',
+                   'keep_translation_units')
 
 
 class ASTContainer(object):
 
-    def __init__(self, module, filename):
+    def __init__(self, module, filename, dependencies=None):
         self.module = module
         self.filename = filename
+        # the paths of the input files of the module, the header
+        # first. None if the frontend doesn't track them.
+        self.dependencies = dependencies
 
 
 class File(object):
@@ -25,22 +37,95 @@ class Config(object):
         self.files = files
         self.save_dir = save_dir or os.getcwd()
         self.metadata = metadata
+        # resources the frontend keeps for the lifetime of the config
+        # and shares between all files, e.g. the clang Index
+        self.frontend_state = {}
+
+    def options_key(self, header_file):
+        """ Returns a digest of the options the code generated for
+        `header_file` depends on.
+
+        """
+        options = dict((name, value) for name, value in self.metadata.items()
+                       if name not in RUNTIME_OPTIONS)
+        key = repr((self.frontend, sorted(options.items()),
+                    sorted(header_file.metadata.items())))
+        return hashlib.sha1(key.encode()).hexdigest()
 
     def generate(self):
+        """ Generates the code for all files. If the `incremental`
+        option is set, files whose inputs didn't change since the last
+        run aren't generated again, and files whose code didn't change
+        aren't rewritten.
+
+        """
+        # imported here, the frontends import the config module and
+        # the cwrap client only creates configs
+        from .backend import renderer
+        from .manifest import Manifest, MANIFEST_NAME, file_digest
+
+        # without the option, the logging the application set up for
+        # the cwrap logger is kept
+        if 'verbose' in self.metadata:
+            log.set_verbosity(self.metadata['verbose'])
         frontend = frontends.get_frontend(self.frontend)
-        cw_asts = frontend.generate_asts(self)
+
+        files = self.files
+        manifest = None
+        if self.metadata.get('incremental'):
+            manifest = Manifest(os.path.join(self.save_dir, MANIFEST_NAME))
+            files = [header_file for header_file in self.files
+                     if not manifest.is_current(header_file.path,
+                                                self.options_key(header_file))]
+            logger.info('%d of %d files changed', len(files), len(self.files))
+            if not files:
+                return
+
+        # each module is rendered once, before the next one is taken,
+        # so its declarations can be transformed while it's rendered
+        cw_asts = frontend.generate_asts(self, files, lazy=True)
         ast_renderer = renderer.ASTRenderer()
+        header_files = dict((header_file.path, header_file)
+                            for header_file in files)
         for ast_container in cw_asts:
             filename = ast_container.filename
             save_path = os.path.join(self.save_dir, filename)
-            print('Rendering %s' % save_path) 
+            logger.info('Rendering %s', save_path)
             mod_node = ast_container.module
-            code = ast_renderer.render(mod_node)
+            # render into a temporary file next to the output, which
+            # then replaces it. The output is never left half written.
+            tmp_path = '%s.%d.tmp' % (save_path, os.getpid())
             try:
-                with open(save_path, 'wb') as f:
-                    f.write(code)
+                f = open(tmp_path, 'w')
             except IOError:
                 msg = 'Could not gain write access to %s' % save_path
                 raise IOError(msg)
+            try:
+                with f:
+                    ast_renderer.render_to(mod_node, f)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+
+            if manifest is None:
+                os.replace(tmp_path, save_path)
+                continue
+
+            digest = file_digest(tmp_path)
+            if manifest.file_digest(save_path) == digest:
+                logger.info('%s is unchanged', save_path)
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, save_path)
+
+            dependencies = ast_container.dependencies
+            if dependencies:
+                header = dependencies[0]
+                manifest.record(header,
+                                self.options_key(header_files[header]),
+                                dependencies, {save_path: digest})
+
+        if manifest is not None:
+            manifest.save()
 
 
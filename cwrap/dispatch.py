@@ -0,0 +1,44 @@
+""" Dispatch of nodes to the methods of visitor classes.
+
+A visitor handles a node of class `Foo` with its method `<prefix>Foo`,
+e.g. `visit_Foo`. Instead of building and looking up that name for
+every node, the visitor classes look the method up in a DispatchTable,
+which maps node classes to methods.
+
+"""
+
+
+class DispatchTable(dict):
+    """ Maps node classes to the unbound methods of `cls` whose name is
+    `prefix` followed by the name of the node class, or to `default`.
+    The methods are collected when the table is created, a node class
+    is mapped the first time a node of that class is dispatched.
+
+    """
+    def __init__(self, cls, prefix, default):
+        dict.__init__(self)
+        self.methods = dict((name[len(prefix):], getattr(cls, name))
+                            for name in dir(cls) if name.startswith(prefix))
+        self.default = default
+
+    def __missing__(self, node_class):
+        method = self.methods.get(node_class.__name__, self.default)
+        self[node_class] = method
+        return method
+
+
+class Visitor(object):
+    """ Base class of visitors. For each item (name, (prefix, default))
+    of `dispatch_tables`, every subclass gets a DispatchTable attribute
+    `name` for the methods starting with `prefix`, which falls back to
+    the method named `default`. Subclasses overriding methods get their
+    own tables.
+
+    """
+    dispatch_tables = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super(Visitor, cls).__init_subclass__(**kwargs)
+        for name, (prefix, default) in cls.dispatch_tables.items():
+            setattr(cls, name,
+                    DispatchTable(cls, prefix, getattr(cls, default)))
@@ -1,19 +1,15 @@
-import os
-import pkgutil
-
 import importlib
 
-# find all the names of the frontend packages
-_frontend_packages = set()
-_pkg_path = os.path.split(__file__)[0]
-for importer, name, is_pkg in pkgutil.iter_modules([_pkg_path]):
-    _frontend_packages.add(name)
+
+# The names of the frontend packages. A static list, scanning the package
+# directory (and importing pkgutil) slows down every run.
+FRONTENDS = ('clang', 'gccxml')
 
 
 def get_frontend(name):
     err_msg = 'Frontend `%s` not found.' % name
     
-    if name not in _frontend_packages:
+    if name not in FRONTENDS:
         raise ImportError(err_msg)
 
     try:
@@ -23,5 +19,3 @@ def get_frontend(name):
         raise ImportError(err_msg + str(e))
     
     return frontend
-
-
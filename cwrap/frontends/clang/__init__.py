@@ -1,65 +1,258 @@
 # Stdlib imports
+import hashlib
+import logging
 import os
-import subprocess
-import tempfile
 
 # Local package imports
 from . import  ast_transforms as transforms
 from . import  clang_parser
+from . import  compdb
+from .clang import cindex
+from .scope import ScopePolicy
+from .tu_cache import TranslationUnitCache, file_stamp
+from ... import log
 
 
-def gen_c_ast(header_path, include_dirs, language):
-    """ Parse the given header file into a C style ast which can be
-    transformed into a CWrap ast. The include dirs are passed along to 
-    gccxml.
+logger = log.get_logger(__name__)
+
+# the Index used by the parser in a worker process
+_worker_index = None
+
+
+#------------------------------------------------------------------------------
+# State shared by all files of a Config
+#------------------------------------------------------------------------------
+def get_index(config):
+    """ Returns the clang Index shared by all the headers of `config`.
 
     """
-    c_ast = clang_parser.parse(header_path, include_dirs, language)
-    return c_ast
+    state = config.frontend_state
+    if 'index' not in state:
+        state['index'] = cindex.Index.create()
+    return state['index']
 
 
-def generate_asts(config):
-    """ Returns an iterable of ASTContainer objects.
+def get_translation_units(config):
+    """ Returns the TranslationUnitCache of `config` if its
+    `keep_translation_units` option is set, None otherwise.
 
     """
-    c_ast_containers = []
-    for header_file in config.files:
-        # read the header info and create the extern and implemenation
-        # module names
-        path = header_file.path
+    if not config.metadata.get('keep_translation_units'):
+        return None
+    state = config.frontend_state
+    if 'tus' not in state:
+        state['tus'] = TranslationUnitCache(get_index(config))
+    return state['tus']
+
+
+def get_prefix(config, extra_args=(), header_file=None):
+    """ Returns the PrecompiledPrefix for the `prefix_header` option of
+    `config` or None if it isn't set. The precompiled header is built
+    on first use and rebuilt when the prefix or one of its includes
+    changes. Headers parsed with different `extra_args` (e.g. defines)
+    get a prefix of their own, a precompiled header only fits the flags
+    it was built with. If `header_file` is the prefix header itself,
+    None is returned too, it is parsed without the prefix.
+
+    """
+    header = config.metadata.get('prefix_header')
+    if header is None:
+        return None
+    header = os.path.abspath(header)
+    if header_file is not None and header_file.path == header:
+        # its declarations would be emitted twice
+        return None
+
+    state = config.frontend_state
+    prefixes = state.setdefault('prefixes', {})
+    key = tuple(extra_args)
+    entry = prefixes.get(key)
+    if entry is not None:
+        prefix, stamp = entry
+        if prefix.header == header and file_stamp(prefix.includes) == stamp:
+            return prefix
+
+    if 'pch_dir' not in state:
+        import tempfile
+        # removed together with the config
+        state['pch_dir'] = tempfile.TemporaryDirectory(prefix='cwrap-pch-')
+    name = 'prefix-%s.pch' % hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+    pch_path = os.path.join(state['pch_dir'].name, name)
+    include_dirs = config.metadata.get('include_dirs', [])
+    language = config.metadata.get('language', '')
+
+    logger.info('Precompiling %s', header)
+    prefix = clang_parser.build_prefix(header, include_dirs, language,
+                                       pch_path, get_index(config),
+                                       list(extra_args))
+    prefixes[key] = (prefix, file_stamp(prefix.includes))
+    return prefix
+
+
+def get_compile_flags(config):
+    """ Returns the CompileFlags of the `compile_commands` option of
+    `config` or None if it isn't set.
+
+    """
+    path = config.metadata.get('compile_commands')
+    if path is None:
+        return None
+    state = config.frontend_state
+    if 'compile_flags' not in state:
+        state['compile_flags'] = compdb.CompileFlags(path)
+    return state['compile_flags']
+
+
+def file_args(header_file, flags=None):
+    """ Returns the extra arguments `header_file` is parsed with: the
+    flags of its compile command in the CompileFlags `flags` followed by
+    its `args` metadata.
+
+    """
+    args = []
+    if flags is not None:
+        args += flags.header_args(header_file.path)
+    args += header_file.metadata.get('args', [])
+    return args
+
+
+def generate_ast(header_file, include_dirs, language, cache_dir=None,
+                 index=None, prefix=None, lazy=False, scope=None, tus=None,
+                 extra_args=None, macros=False):
+    """ Parses a single header file and transforms it into an
+    ASTContainer. This is the unit of work handed to the worker
+    processes when generating in parallel. The `filename` metadata of
+    `header_file` is the name of the generated file, by default
+    `extern_name` with a .pxd suffix. If `lazy` is True, the
+    declarations are transformed while the module is rendered. `scope`
+    is an optional ScopePolicy, `tus` an optional TranslationUnitCache
+    and `extra_args` more arguments passed to libclang. If `macros` is
+    True, the #define constants are declared too.
+
+    """
+    # read the header info and create the extern and implemenation
+    # module names
+    path = header_file.path
+    header_name = header_file.metadata.get('header_name')
+    if header_name is None:
         header_name = os.path.split(path)[-1]
-        extern_name = header_file.metadata.get('extern_name')
-        implementation_name = header_file.metadata.get('implementation_name')
-        if extern_name is None:
-            extern_name = '_' + os.path.splitext(header_name)[0]
-        if implementation_name is None:
-            implementation_name = os.path.splitext(header_name)[0]
-
-        # generate the c_ast for the header 
-        include_dirs = config.metadata.get('include_dirs', [])
-
-        language = config.metadata.get('language', '')
-        
-        print('Parsing %s' % path)
-        ast_items = gen_c_ast(path, include_dirs, language) 
-
-        print('in __init__/generate_asts()')
-        print('file parsed')
-        print('AST:', ast_items)
+    extern_name = header_file.metadata.get('extern_name')
+    implementation_name = header_file.metadata.get('implementation_name')
+    if extern_name is None:
+        extern_name = '_' + os.path.splitext(os.path.basename(header_name))[0]
+    if implementation_name is None:
+        implementation_name = os.path.splitext(os.path.basename(header_name))[0]
+
+    # generate the c_ast for the header 
+    logger.info('Parsing %s', path)
+    ast_items, includes = clang_parser.parse_with_includes(
+        path, include_dirs, language, cache_dir, index, prefix, scope, tus,
+        extra_args, macros)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('AST: %s', ast_items)
         for item in ast_items:
-            print(item.__class__.__name__, item.name)
-        
-        # Apply the transformations to the ast items 
-        trans_items = transforms.apply_c_ast_transformations(ast_items)
-        
-        # Create the CAstContainer for these items
-        container = transforms.CAstContainer(trans_items, header_name, 
-                                             extern_name, implementation_name)
-
-        # Add the container to the list
-        c_ast_containers.append(container)
-
-    # Now we can create an ast transformer and transform the list 
-    # of containers into a generator that can be rendered into code
-    ast_transformer = transforms.CAstTransformer(c_ast_containers)
-    return ast_transformer.transform()
+            logger.debug('%s %s', item.__class__.__name__, item.name)
+    
+    # Apply the transformations to the ast items 
+    trans_items = transforms.apply_c_ast_transformations(ast_items)
+    
+    # Create the CAstContainer for these items
+    container = transforms.CAstContainer(trans_items, header_name, 
+                                         extern_name, implementation_name)
+
+    # There's only a single container
+    ast_transformer = transforms.CAstTransformer([container], lazy)
+    ast_container = next(ast_transformer.transform())
+    filename = header_file.metadata.get('filename')
+    if filename is not None:
+        ast_container.filename = filename
+    ast_container.dependencies = [path] + includes
+    return ast_container
+
+
+def _generate_ast_task(args):
+    (header_file, include_dirs, language, cache_dir, prefix, scope,
+     extra_args, macros) = args
+    return generate_ast(header_file, include_dirs, language, cache_dir,
+                        _worker_index, prefix, scope=scope,
+                        extra_args=extra_args, macros=macros)
+
+
+def _init_worker(verbose):
+    global _worker_index
+    # the workers log with the same verbosity as the parent and share
+    # one Index between all the headers they parse
+    log.set_verbosity(verbose)
+    _worker_index = cindex.Index.create()
+
+
+def _generate_asts_parallel(tasks, jobs, verbose):
+    # imported here, most runs don't start workers
+    import multiprocessing
+
+    with multiprocessing.Pool(jobs, _init_worker, (verbose,)) as pool:
+        # imap hands back the results in the order of `tasks`, so the
+        # output doesn't depend on which worker finishes first.
+        for ast_container in pool.imap(_generate_ast_task, tasks):
+            yield ast_container
+
+
+def _with_dependency(ast_containers, path):
+    for ast_container in ast_containers:
+        ast_container.dependencies.append(path)
+        yield ast_container
+
+
+def generate_asts(config, files=None, lazy=False):
+    """ Returns an iterable of ASTContainer objects for `files` (by
+    default all files of the config). If `lazy` is True and the headers
+    are generated serially, the declarations of a module are
+    transformed while it's rendered, so each module can be rendered
+    only once. If the `jobs` option is larger than 1, the header files
+    are parsed and transformed by that many worker processes. If the `prefix_header` option is set, that header
+    is precompiled once and used for all the header files. The scope
+    options (see the scope module) restrict the files declarations are
+    taken from. With the `compile_commands` option every header is
+    parsed with the flags of the compilation database (see the compdb
+    module); the headers are generated grouped by their flags, one
+    prefix is precompiled per group. With the `macros` option the
+    #define constants are declared too (see the macros module).
+
+    """
+    include_dirs = config.metadata.get('include_dirs', [])
+    language = config.metadata.get('language', '')
+    cache_dir = config.metadata.get('cache_dir')
+    jobs = config.metadata.get('jobs', 1)
+    verbose = config.metadata.get('verbose', 0)
+    macros = config.metadata.get('macros', False)
+
+    if files is None:
+        files = config.files
+    flags = get_compile_flags(config)
+    groups = compdb.group_by_args(files, lambda f: file_args(f, flags))
+    scope = ScopePolicy.from_metadata(config.metadata)
+
+    if jobs > 1 and len(files) > 1:
+        tasks = [(header_file, include_dirs, language, cache_dir,
+                  get_prefix(config, args, header_file), scope, args,
+                  macros)
+                 for args, group in groups
+                 for header_file in group]
+        ast_containers = _generate_asts_parallel(
+            tasks, min(jobs, len(tasks)), verbose)
+    else:
+        index = get_index(config)
+        tus = get_translation_units(config)
+        ast_containers = (
+            generate_ast(header_file, include_dirs, language, cache_dir,
+                         index, get_prefix(config, args, header_file),
+                         lazy=lazy, scope=scope, tus=tus, extra_args=args,
+                         macros=macros)
+            for args, group in groups
+            for header_file in group)
+
+    if flags is not None:
+        # the flags change with the database
+        ast_containers = _with_dependency(ast_containers, flags.db_path)
+    return ast_containers
@@ -1,11 +1,16 @@
 # CWrap imports
 from ...backend import cw_ast
 from ...config import ASTContainer
+from ...dispatch import Visitor
+from ...log import get_logger
 
 # Local package imports
 from . import c_ast
 
 
+logger = get_logger(__name__)
+
+
 def find_toplevel_items(items):
     """ Finds and returns the toplevel items given a list of items, one
     of which should be a toplevel namespace node.
@@ -61,8 +66,10 @@ def _flatten_container(container, items=None): #, context_name=None):
     if not parent_name:
         parent_name = container.typedef_name
 
-    mod_context = []
-    for i, field in enumerate(container.members):
+    # the typedefs replacing the nested definitions, by the id of the
+    # definition
+    typedefs = {}
+    for field in container.members:
         if isinstance(field, (c_ast.Struct, c_ast.Union)):
             # Create the necessary mangled names
             mangled_name = '__%s_%s' % (parent_name, field.name)
@@ -81,20 +88,22 @@ def _flatten_container(container, items=None): #, context_name=None):
 
             # Add the typedef to the list of items
             items.append(typedef)
+            typedefs[id(field)] = typedef
 
-            # Add the necessary information to the mod_context so
-            # we can modify the list of members at the end.
-            mod_context.append((i, field, typedef))
-
-    # Use the mod_context to remove the nest definitions and replace
-    # any fields that reference them with the typedefs.
-    for idx, field, typedef in reversed(mod_context):
-        r = container.members.pop(idx) #TODO????
-        print('removed member', r.name)
+    # Remove the nested definitions and replace any fields that
+    # reference them with the typedefs, in a single pass.
+    if typedefs:
+        members = []
         for member in container.members:
+            if id(member) in typedefs:
+                logger.debug('removed member %s', member.name)
+                continue
             if isinstance(member, c_ast.Field):
-                if member.typ is field:
+                typedef = typedefs.get(id(member.typ))
+                if typedef is not None:
                     member.typ = typedef
+            members.append(member)
+        container.members = members
 
     items.append(container) #removed for typedef???
 
@@ -198,49 +207,58 @@ class CAstContainer(object):
         self.implementation_name = implementation_name
 
 
-class CAstTransformer(object):
+class CAstTransformer(Visitor):
 
-    def __init__(self, ast_containers):
+    dispatch_tables = {
+        '_visitors': ('visit_', 'generic_visit'),
+        '_translators': ('translate_', 'generic_translate'),
+    }
+
+    def __init__(self, ast_containers, lazy=False):
         # XXX - work out the symbols
         self.ast_containers = ast_containers
         self.pxd_nodes = []
         self.modifier_stack = []
+        # If `lazy` is True, the body of the ExternFrom of each module
+        # is an iterator, which transforms the items while the renderer
+        # consumes it. Such modules can't be pickled.
+        self.lazy = lazy
 
     def transform(self):
         for container in self.ast_containers:
-            items = container.items
-            self.pxd_nodes = []
-            self.modifier_stack = []
-            header_name = container.header_name
-
-            for item in items:
-                # only transform items for this header (not #include'd
-                # or other __builtin__ stuff)
-                if item.location is not None:
-                    #if not item.location[0].endswith(header_name):
-                    #    continue
-                    pass #include everythin
-                self.visit(item)
-                #TODO: debug only
-                #print self.pxd_nodes
-                #print
-
-            extern = cw_ast.ExternFrom(container.header_name, self.pxd_nodes)
+            body = self.iter_pxd_nodes(container)
+            if not self.lazy:
+                body = list(body)
+
+            extern = cw_ast.ExternFrom(container.header_name, body)
             cdef_decl = cw_ast.CdefDecl([], extern)
             mod = cw_ast.Module([cdef_decl])
 
             yield ASTContainer(mod, container.extern_name + '.pxd')
 
+    def iter_pxd_nodes(self, container):
+        """ Transforms the items of `container` one at a time and yields
+        the statements generated for each of them.
+
+        """
+        self.modifier_stack = []
+        for item in container.items:
+            # the visitors append to `pxd_nodes`
+            self.pxd_nodes = []
+            self.visit(item)
+            for node in self.pxd_nodes:
+                yield node
+
     def visit(self, node):
-        visitor_name = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, visitor_name, self.generic_visit)
-        res = visitor(node)
-        return res
+        return self._visitors[node.__class__](self, node)
 
     def generic_visit(self, node):
         pass
         #print 'unhandled node in generic_visit: %s' % node
 
+    def generic_translate(self, node):
+        return None
+
     #--------------------------------------------------------------------------
     # Toplevel visitors
     #--------------------------------------------------------------------------
@@ -378,8 +396,7 @@ class CAstTransformer(object):
     # render nodes
     #--------------------------------------------------------------------------
     def visit_translate(self, node):
-        name = 'translate_' + node.__class__.__name__
-        res = getattr(self, name, lambda arg: None)(node)
+        res = self._translators[node.__class__](self, node)
         if res is None:
             #print 'Unhandled node in translate: ', node
             pass
@@ -1,17 +1,57 @@
+def remove_member(members, node):
+    """ Removes `node` from the list `members`, comparing by identity.
+    The list is searched from the end, where the node just parsed is,
+    so removing it takes constant time. Raises ValueError if `node`
+    isn't in `members`.
+
+    """
+    for idx in range(len(members) - 1, -1, -1):
+        if members[idx] is node:
+            del members[idx]
+            return
+    raise ValueError('%r is not a member' % (node,))
+
+
+# The nodes use __slots__, large headers produce millions of them.
 class C_ASTNode(object):
 
+    __slots__ = ('_file', '_line', 'name')
+
     def __init__(self, *args, **kwargs):
-        self.location = None
+        self._file = None
+        self._line = 0
         #self.render_hints = {}
         self.name = ''
         self.init(*args, **kwargs)
        
     def init(self, *args, **kwargs):
         pass
+
+    @property
+    def location(self):
+        """ A (file name, line) tuple or None.
+
+        """
+        if self._file is None:
+            return None
+        return (self._file, self._line)
+
+    @location.setter
+    def location(self, location):
+        if location is None:
+            self._file = None
+            self._line = 0
+        else:
+            # the parser hands the same file name object to all the
+            # nodes of a file (see Cursor.snapshot)
+            self._file = location[0]
+            self._line = int(location[1])
   
     
 class Typedef(C_ASTNode):
 
+    __slots__ = ('typ', 'context')
+
     def init(self, name, typ, context):
         self.name = name
         self.typ = typ
@@ -19,11 +59,15 @@ class Typedef(C_ASTNode):
 
 class FundamentalType(C_ASTNode):
 
+    __slots__ = ()
+
     def init(self, name):
         self.name = name
 
 class CvQualifiedType(C_ASTNode):
 
+    __slots__ = ('typ', 'const', 'volatile')
+
     def init(self, typ, const, volatile):
         self.typ = typ
         self.const = const
@@ -31,6 +75,8 @@ class CvQualifiedType(C_ASTNode):
 
 class Ignored(C_ASTNode):
 
+    __slots__ = ('arguments',)
+
     def init(self, name):
         self.name = name
         self.arguments = []
@@ -47,6 +93,8 @@ class Ignored(C_ASTNode):
 
 
 class Field(C_ASTNode):
+
+    __slots__ = ('typ', 'context')
     
     def init(self, name, typ, context, bits=None, offset=None):
         self.name = name
@@ -57,6 +105,8 @@ class Field(C_ASTNode):
    
 
 class Struct(C_ASTNode):
+
+    __slots__ = ('members', 'context', 'typedef_name')
     
     def init(self, name, members = None, context = None):
         self.name = name
@@ -75,6 +125,8 @@ class Struct(C_ASTNode):
 
 
 class Union(C_ASTNode):
+
+    __slots__ = ('members', 'context', 'typedef_name')
     
     def init(self, name, align = None, members = None, context = None, bases = None, size = None):
         self.name = name
@@ -96,12 +148,16 @@ class Union(C_ASTNode):
             
 class EnumValue(C_ASTNode):
 
+    __slots__ = ('value',)
+
     def init(self, name, value):
         self.name = name
         self.value = value
     
 
 class Enumeration(C_ASTNode):
+
+    __slots__ = ('context', 'values', 'typedef_name')
     
     def init(self, name, context):
         self.name = name
@@ -120,6 +176,8 @@ class Enumeration(C_ASTNode):
 
 class PointerType(C_ASTNode):
 
+    __slots__ = ('typ', 'size', 'align')
+
     def init(self, typ, size, align):
         self.typ = typ
         self.size = size
@@ -132,6 +190,8 @@ class PointerType(C_ASTNode):
 
 class ArrayType(C_ASTNode):
 
+    __slots__ = ('typ', 'min', 'max')
+
     def init(self, typ, min, max):
         self.typ = typ
         self.min = min
@@ -140,6 +200,8 @@ class ArrayType(C_ASTNode):
 
 class Argument(C_ASTNode):
 
+    __slots__ = ('typ',)
+
     def init(self, name, typ):
         self.typ = typ
         self.name = name
@@ -147,6 +209,8 @@ class Argument(C_ASTNode):
 
 class Function(C_ASTNode):
 
+    __slots__ = ('returns', 'context', 'attributes', 'extern', 'arguments')
+
     def init(self, name, returns, context=None, attributes=None, extern=None):
         self.name = name
         self.returns = returns
@@ -168,6 +232,8 @@ class Function(C_ASTNode):
 
 class FunctionType(C_ASTNode):
 
+    __slots__ = ('returns', 'attributes', 'arguments')
+
     def init(self, returns, attributes):
         self.returns = returns
         self.attributes = attributes
@@ -185,6 +251,9 @@ class FunctionType(C_ASTNode):
 
 class OperatorFunction(C_ASTNode):
 
+    __slots__ = ('returns', 'context', 'attributes', 'extern',
+                 'arguments')
+
     def init(self, name, returns, context, attributes, extern):
         self.name = name
         self.returns = returns
@@ -206,6 +275,8 @@ class OperatorFunction(C_ASTNode):
 
 class Macro(C_ASTNode):
 
+    __slots__ = ('args', 'body')
+
     def init(self, name, args, body):
         self.name = name
         self.args = args
@@ -214,6 +285,8 @@ class Macro(C_ASTNode):
 
 class Alias(C_ASTNode):
 
+    __slots__ = ('value', 'typ')
+
     def init(self, name, value, typ=None):
         self.name = name
         self.value = value
@@ -222,6 +295,8 @@ class Alias(C_ASTNode):
 
 class File(C_ASTNode):
 
+    __slots__ = ('members',)
+
     def init(self, name, members = None):
         self.name = name
         self.members = members if members is not None else []
@@ -236,6 +311,8 @@ class File(C_ASTNode):
 
 class Namespace(C_ASTNode):
 
+    __slots__ = ('members',)
+
     def init(self, name, members = None):
         self.name = name
         self.members = members if members is not None else []
@@ -249,22 +326,28 @@ class Namespace(C_ASTNode):
 
 class Variable(C_ASTNode):
 
+    __slots__ = ('typ', 'context', 'initializer')
+
     def init(self, name, typ, context, init):
         self.name = name
         self.typ = typ
         self.context = context
-        self.init = init
+        # not `init`, that's the name of the method
+        self.initializer = init
 
 #-----------------
 # C++ nodes
 #-----------------
 
 class Class(C_ASTNode):
+
+    __slots__ = ('members', 'context', 'template_params')
     
     def init(self, name, members = None, context = None):
         self.name = name
         self.members = members if members is not None else []
         self.context = context
+        self.template_params = []
         
     def add_member(self, member):
         if member is not None:
@@ -273,18 +356,18 @@ class Class(C_ASTNode):
     add_child = add_member
 
     #TODO: own class for ClassTemplate ????
-    template_params = []
     def add_template_parameter(self, template_param):
         self.template_params.append(template_param)
 
 class ClassTemplate(Class):
-    
-    template_params = []
-    def add_template_parameter(self, template_param):
-        self.template_params.append(template_param)
+
+    __slots__ = ()
 
 class RefType(C_ASTNode):
     #C++ reference type
+
+    __slots__ = ('typ',)
+
     def init(self, typ):
         self.typ = typ
 
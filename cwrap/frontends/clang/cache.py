@@ -0,0 +1,115 @@
+""" A persistent, on-disk cache for the results of the clang parser.
+
+An entry is addressed by the header being parsed (its path and contents)
+and the arguments handed to libclang (include dirs, language, ...). Each
+entry also records the contents hash of every file the translation unit
+included, so touching any header in the include graph invalidates it.
+
+"""
+# Stdlib imports
+import hashlib
+import os
+import pickle
+import tempfile
+
+
+# Bump whenever the layout of the pickled c_ast items changes, so stale
+# entries written by an older cwrap are never loaded.
+CACHE_VERSION = 2
+
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class ParseCache(object):
+    """ Maps a (header, compiler args) pair to the list of c_ast items
+    `ClangParser.get_result()` returned for it.
+
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        # content digests of the files seen during this run; headers
+        # are usually shared by many translation units.
+        self._file_digests = {}
+
+    #--------------------------------------------------------------------------
+    # Keys
+    #--------------------------------------------------------------------------
+    def file_digest(self, path):
+        """ Returns the sha1 of the contents of `path` or None if it
+        can't be read.
+
+        """
+        try:
+            return self._file_digests[path]
+        except KeyError:
+            pass
+        try:
+            with open(path, 'rb') as f:
+                digest = _digest(f.read())
+        except (IOError, OSError):
+            digest = None
+        self._file_digests[path] = digest
+        return digest
+
+    def entry_key(self, cfile, args, unsaved_files=None):
+        """ Computes the key of the entry for `cfile` parsed with `args`.
+        Contents given through `unsaved_files` (a list of (name, string)
+        tuples) take precedence over the ones on disk.
+
+        """
+        parts = [str(CACHE_VERSION), os.path.abspath(cfile)]
+        unsaved = dict(unsaved_files or [])
+        if cfile not in unsaved:
+            parts.append(str(self.file_digest(cfile)))
+        for name, contents in sorted(unsaved.items()):
+            parts.append(name + ':' + _digest(contents.encode()))
+        parts.extend(args)
+        return _digest('\0'.join(parts).encode())
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.pickle')
+
+    #--------------------------------------------------------------------------
+    # Lookup and storage
+    #--------------------------------------------------------------------------
+    def lookup(self, cfile, args, unsaved_files=None):
+        """ Returns a (items, includes) tuple for a valid entry, None on
+        a cache miss.
+
+        """
+        key = self.entry_key(cfile, args, unsaved_files)
+        try:
+            with open(self._entry_path(key), 'rb') as f:
+                includes, items = pickle.load(f)
+        except Exception:
+            # missing, truncated or written by an incompatible version
+            return None
+
+        for path, digest in includes:
+            if self.file_digest(path) != digest:
+                return None
+        return items, [path for path, digest in includes]
+
+    def store(self, cfile, args, unsaved_files, includes, items):
+        """ Writes the entry for `cfile`. `includes` is the list of
+        paths of every file the translation unit included.
+
+        """
+        key = self.entry_key(cfile, args, unsaved_files)
+        includes = [(path, self.file_digest(path)) for path in includes]
+
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        # write to a temporary file first, so concurrent builds never
+        # see a half written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((includes, items), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._entry_path(key))
+        except Exception:
+            os.remove(tmp_path)
+            raise
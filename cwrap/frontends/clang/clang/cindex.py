@@ -63,7 +63,8 @@ call is efficient.
 # o implement additional SourceLocation, SourceRange, and File methods.
 
 from ctypes import *
-import collections
+import collections.abc
+import os
 
 #import clang.enumerations
 from . import enumerations
@@ -215,6 +216,11 @@ class SourceLocation(Structure):
         """Get the file offset represented by this source location."""
         return self._get_instantiation()[3]
 
+    @property
+    def is_in_system_header(self):
+        """Returns true if the given source location is in a system header."""
+        return bool(conf.lib.clang_Location_isInSystemHeader(self))
+
     def __eq__(self, other):
         return conf.lib.clang_equalLocations(self, other)
 
@@ -1039,6 +1045,40 @@ CursorKind.INCLUSION_DIRECTIVE = CursorKind(503)
 
 ### Cursors ###
 
+# The ids of the declaration kinds (CXCursor_FirstDecl to CXCursor_LastDecl
+# and CXCursor_FirstExtraDecl to CXCursor_LastExtraDecl).
+_DECLARATION_KIND_IDS = frozenset(list(range(1, 40)) + list(range(600, 604)))
+
+def cursor_key(cursor):
+    """Return a hashable key for the cursor, computed without calling into
+    libclang.
+
+    Like clang_equalCursors, the "first in declaration group" flag of
+    declaration cursors is ignored, so cursors for the same declaration have
+    the same key.
+    """
+    kind_id = cursor._kind_id
+    data = cursor.data
+    if kind_id in _DECLARATION_KIND_IDS:
+        return (kind_id, data[0], data[2])
+    return (kind_id, data[0], data[1], data[2])
+
+class CursorSnapshot(object):
+    """
+    The attributes of a cursor read for every cursor of a translation unit,
+    see Cursor.snapshot().
+
+    file_name is None for cursors without a location (e.g. builtins),
+    spelling is None for cursors which aren't declarations.
+    """
+    __slots__ = ('kind', 'spelling', 'file_name', 'line')
+
+    def __init__(self, kind, spelling, file_name, line):
+        self.kind = kind
+        self.spelling = spelling
+        self.file_name = file_name
+        self.line = line
+
 class Cursor(Structure):
     """
     The Cursor class represents a reference to an element within the AST. It
@@ -1103,15 +1143,50 @@ class Cursor(Structure):
     @property
     def spelling(self):
         """Return the spelling of the entity pointed at by the cursor."""
-        if not self.kind.is_declaration():
-            # FIXME: clang_getCursorSpelling should be fixed to not assert on
-            # this, for consistency with clang_getCursorUSR.
-            return None
         if not hasattr(self, '_spelling'):
+            if not self.kind.is_declaration():
+                # FIXME: clang_getCursorSpelling should be fixed to not assert
+                # on this, for consistency with clang_getCursorUSR.
+                return None
             self._spelling = conf.lib.clang_getCursorSpelling(self)
 
         return self._spelling
 
+    def snapshot(self):
+        """Return a CursorSnapshot of the kind, spelling and location of this
+        cursor.
+
+        The location takes two calls into libclang and the file name is looked
+        up once per file of the translation unit (by file handle), instead of
+        creating a SourceLocation and a File and looking up the name for every
+        cursor.
+        """
+        try:
+            return self._snapshot
+        except AttributeError:
+            pass
+        kind = CursorKind.from_id(self._kind_id)
+        spelling = None
+        if self._kind_id in _DECLARATION_KIND_IDS:
+            spelling = self._spelling = conf.lib.clang_getCursorSpelling(self)
+        f, line = c_object_p(), c_uint()
+        conf.lib.clang_getInstantiationLocation(
+            conf.lib.clang_getCursorLocation(self), byref(f), byref(line),
+            None, None)
+        file_name = None
+        if f:
+            handle = c_void_p.from_buffer(f).value
+            tu = self._tu
+            try:
+                file_names = tu._file_names
+            except AttributeError:
+                file_names = tu._file_names = {}
+            file_name = file_names.get(handle)
+            if file_name is None:
+                file_name = file_names[handle] = File(f).name
+        self._snapshot = CursorSnapshot(kind, spelling, file_name, line.value)
+        return self._snapshot
+
     @property
     def displayname(self):
         """
@@ -1280,21 +1355,36 @@ class Cursor(Structure):
 
     def get_children(self):
         """Return an iterator for accessing the children of this cursor."""
+        return iter(self.get_children_map()[cursor_key(self)])
 
-        # FIXME: Expose iteration from CIndex, PR6125.
-        def visitor(child, parent, children):
-            # FIXME: Document this assertion in API.
-            # FIXME: There should just be an isNull method.
-            assert child != conf.lib.clang_getNullCursor()
+    def get_children_map(self, recurse_kinds=()):
+        """Enumerate the children of this cursor in bulk.
 
+        The children of the descendants whose kind is in recurse_kinds are
+        enumerated too, in the same pass over the AST. Return a dict mapping
+        the cursor_key() of this cursor and of each of those descendants to
+        the list of its children.
+        """
+        # FIXME: Expose iteration from CIndex, PR6125.
+        # The visitor runs once per child, so it avoids any call back into
+        # libclang.
+        tu = self._tu
+        key = cursor_key
+        recurse_ids = frozenset(kind.value for kind in recurse_kinds)
+        children = {key(self): []}
+
+        def visitor(child, parent, data):
             # Create reference to TU so it isn't GC'd before Cursor.
-            child._tu = self._tu
-            children.append(child)
+            child._tu = tu
+            children[key(parent)].append(child)
+            if child._kind_id in recurse_ids:
+                children[key(child)] = []
+                return 2 # recurse
             return 1 # continue
-        children = []
+
         conf.lib.clang_visitChildren(self, callbacks['cursor_visit'](visitor),
-            children)
-        return iter(children)
+            None)
+        return children
 
     def get_tokens(self):
         """Obtain Token instances formulating that compose this Cursor.
@@ -1474,7 +1564,7 @@ class Type(Structure):
         The returned object is iterable and indexable. Each item in the
         container is a Type instance.
         """
-        class ArgumentsIterator(collections.Sequence):
+        class ArgumentsIterator(collections.abc.Sequence):
             def __init__(self, parent):
                 self.parent = parent
                 self.length = None
@@ -1867,7 +1957,7 @@ class Index(ClangObject):
 
     def read(self, path):
         """Load a TranslationUnit from the given AST file."""
-        return TranslationUnit.from_ast(path, self)
+        return TranslationUnit.from_ast_file(path, self)
 
     def parse(self, path, args=None, unsaved_files=None, options = 0):
         """Load the translation unit from the given source code file by running
@@ -1986,15 +2076,16 @@ class TranslationUnit(ClangObject):
                 if hasattr(contents, "read"):
                     contents = contents.read()
 
+                contents = contents.encode()
                 unsaved_array[i].name = name.encode()
-                unsaved_array[i].contents = contents.encode()
+                unsaved_array[i].contents = contents
                 unsaved_array[i].length = len(contents)
 
         ptr = conf.lib.clang_parseTranslationUnit(index, filename.encode(), args_array,
                                     len(args), unsaved_array,
                                     len(unsaved_files), options)
 
-        if ptr is None:
+        if not ptr:
             raise TranslationUnitLoadError("Error parsing translation unit.")
 
         return cls(ptr, index=index)
@@ -2015,8 +2106,8 @@ class TranslationUnit(ClangObject):
         if index is None:
             index = Index.create()
 
-        ptr = conf.lib.clang_createTranslationUnit(index, filename)
-        if ptr is None:
+        ptr = conf.lib.clang_createTranslationUnit(index, os.fsencode(filename))
+        if not ptr:
             raise TranslationUnitLoadError(filename)
 
         return cls(ptr=ptr, index=index)
@@ -2165,14 +2256,19 @@ class TranslationUnit(ClangObject):
                     # FIXME: It would be great to support an efficient version
                     # of this, one day.
                     value = value.read()
-                    print(value)
                 if not isinstance(value, str):
                     raise TypeError('Unexpected unsaved file contents.')
-                unsaved_files_array[i].name = name
+                value = value.encode()
+                unsaved_files_array[i].name = os.fsencode(name)
                 unsaved_files_array[i].contents = value
                 unsaved_files_array[i].length = len(value)
-        ptr = conf.lib.clang_reparseTranslationUnit(self, len(unsaved_files),
-                unsaved_files_array, options)
+        # the file handles of the previous parse are gone
+        self._file_names = {}
+        result = conf.lib.clang_reparseTranslationUnit(self,
+                len(unsaved_files), unsaved_files_array, options)
+        if result != 0:
+            raise TranslationUnitLoadError(
+                'Error reparsing translation unit.')
 
     def save(self, filename):
         """Saves the TranslationUnit to a file.
@@ -2190,7 +2286,8 @@ class TranslationUnit(ClangObject):
         filename -- The path to save the translation unit to.
         """
         options = conf.lib.clang_defaultSaveOptions(self)
-        result = int(conf.lib.clang_saveTranslationUnit(self, filename,
+        result = int(conf.lib.clang_saveTranslationUnit(self,
+                                                        os.fsencode(filename),
                                                         options))
         if result != 0:
             raise TranslationUnitSaveError(result,
@@ -2345,19 +2442,24 @@ class CompileCommand(object):
     @property
     def directory(self):
         """Get the working directory for this CompileCommand"""
-        return conf.lib.clang_CompileCommand_getDirectory(self.cmd)
+        return os.fsdecode(conf.lib.clang_CompileCommand_getDirectory(self.cmd))
+
+    @property
+    def filename(self):
+        """Get the source file of this CompileCommand"""
+        return os.fsdecode(conf.lib.clang_CompileCommand_getFilename(self.cmd))
 
     @property
     def arguments(self):
         """
         Get an iterable object providing each argument in the
-        command line for the compiler invocation as a _CXString.
+        command line for the compiler invocation as a str.
 
         Invariant : the first argument is the compiler executable
         """
         length = conf.lib.clang_CompileCommand_getNumArgs(self.cmd)
         for i in range(length):
-            yield conf.lib.clang_CompileCommand_getArg(self.cmd, i)
+            yield os.fsdecode(conf.lib.clang_CompileCommand_getArg(self.cmd, i))
 
 class CompileCommands(object):
     """
@@ -2408,8 +2510,8 @@ class CompilationDatabase(ClangObject):
         """Builds a CompilationDatabase from the database found in buildDir"""
         errorCode = c_uint()
         try:
-            cdb = conf.lib.clang_CompilationDatabase_fromDirectory(buildDir,
-                byref(errorCode))
+            cdb = conf.lib.clang_CompilationDatabase_fromDirectory(
+                os.fsencode(buildDir), byref(errorCode))
         except CompilationDatabaseError as e:
             raise CompilationDatabaseError(int(errorCode.value),
                                            "CompilationDatabase loading failed")
@@ -2421,7 +2523,15 @@ class CompilationDatabase(ClangObject):
         build filename. Returns None if filename is not found in the database.
         """
         return conf.lib.clang_CompilationDatabase_getCompileCommands(self,
-                                                                     filename)
+                                                       os.fsencode(filename))
+
+    def getAllCompileCommands(self):
+        """
+        Get an iterable object providing all the CompileCommands available from
+        the database.
+        """
+        return conf.lib.clang_CompilationDatabase_getAllCompileCommands(self)
+
 class CommentKind(object):
     #similar to CursorKind
     """
@@ -2575,6 +2685,11 @@ functionList = [
    c_object_p,
    CompilationDatabase.from_result),
 
+  ("clang_CompilationDatabase_getAllCompileCommands",
+   [c_object_p],
+   c_object_p,
+   CompileCommands.from_result),
+
   ("clang_CompilationDatabase_getCompileCommands",
    [c_object_p, c_char_p],
    c_object_p,
@@ -2601,6 +2716,11 @@ functionList = [
    _CXString,
    _CXString.from_result),
 
+  ("clang_CompileCommand_getFilename",
+   [c_object_p],
+   _CXString,
+   _CXString.from_result),
+
   ("clang_CompileCommand_getNumArgs",
    [c_object_p],
    c_uint),
@@ -2894,6 +3014,10 @@ functionList = [
    [TranslationUnit, File, c_uint, c_uint],
    SourceLocation),
 
+  ("clang_Location_isInSystemHeader",
+   [SourceLocation],
+   c_int),
+
   ("clang_getLocationForOffset",
    [TranslationUnit, File, c_uint],
    SourceLocation),
@@ -3181,6 +3305,34 @@ def register_functions(lib, ignore_errors):
 
     list(map(register, functionList))
 
+class LazyLibrary(object):
+    """A libclang library instance whose functions are registered on first
+    use.
+
+    Registering all prototypes up front costs more than most short runs call
+    into libclang. The compatibility of the bindings with the library is
+    checked function by function too: a function missing from the library
+    raises AttributeError when it is used (see Config.function_exists).
+    """
+
+    def __init__(self, lib):
+        self._lib = lib
+        self._prototypes = dict((item[0], item) for item in functionList)
+
+    def __getattr__(self, name):
+        # only called for functions not registered yet
+        try:
+            func = getattr(self._lib, name)
+        except AttributeError as e:
+            raise AttributeError(str(e) + ". Please ensure that your python "
+                                 "bindings are compatible with your "
+                                 "libclang.so version.")
+        item = self._prototypes.get(name)
+        if item is not None:
+            register_function(self._lib, item, False)
+        setattr(self, name, func)
+        return func
+
 class Config:
     library_path = None
     library_file = None
@@ -3231,8 +3383,8 @@ class Config:
 
     @CachedProperty
     def lib(self):
-        lib = self.get_cindex_library()
-        register_functions(lib, not Config.compatibility_check)
+        # the functions are registered when they are first used
+        lib = LazyLibrary(self.get_cindex_library())
         Config.loaded = True
         return lib
 
@@ -7,14 +7,21 @@
 
 #originally Thomas Heller, MIT license
 
+import logging
 import os
 import sys
 import re
 
 from . import c_ast
+from .cache import ParseCache
+from ...log import get_logger
 
 from . import clang
-from .clang.cindex import CursorKind, TypeKind
+from .clang.cindex import CursorKind, TypeKind, cursor_key
+from .macros import constant_kind, INTEGER, FLOAT, STRING
+
+
+logger = get_logger(__name__)
 
 
 # A function show(level, *args) would have been simpler but less fun
@@ -22,9 +29,11 @@ from .clang.cindex import CursorKind, TypeKind
 # it to be exchangeable.
 class Level(int):
     '''represent currently visited level of a tree'''
-    def show(self, *args):
-        '''pretty print an indented line'''
-        print('\t'*self + ' '.join(map(str, args)))
+    def show(self, msg, *args):
+        '''log an indented debug line, `msg` is only formatted with
+        `args` if debug output is enabled'''
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('\t'*self + msg, *args)
     def __add__(self, inc):
         '''increase level'''
         return Level(super(Level, self).__add__(inc))
@@ -56,6 +65,64 @@ def CHECK_NAME(name):
     return None
 
 
+def compiler_args(include_dirs, language):
+    """ Builds the command line arguments passed to libclang.
+
+    """
+    args_include_dirs = ['-I'+d for d in include_dirs]
+    args_language = ['-x'+language if language else '']
+    return args_include_dirs + args_language
+
+
+class PrecompiledPrefix(object):
+    """ A prefix header that was parsed once and saved as a precompiled
+    header. It is included into every header parsed with it, so the
+    declarations it pulls in aren't parsed again for each of them.
+
+    """
+    def __init__(self, header, pch_path, includes):
+        self.header = header
+        self.pch_path = pch_path
+        # the files included by the prefix, they aren't reported by
+        # the translation units using the precompiled header.
+        self.includes = includes
+
+    def args(self):
+        """ The arguments passed to libclang to use the precompiled
+        header.
+
+        """
+        return ['-include-pch', self.pch_path]
+
+    def key_args(self):
+        """ The arguments identifying the prefix in the parse cache.
+        Unlike the path of the precompiled header they don't change
+        between runs.
+
+        """
+        return ['-include', self.header]
+
+
+def build_prefix(header, include_dirs, language, pch_path, index=None,
+                 extra_args=None):
+    """ Parses the prefix header `header` and saves it as a precompiled
+    header at `pch_path`. Returns a PrecompiledPrefix. `extra_args` are
+    more arguments passed to libclang, the headers using the prefix
+    must be parsed with the same ones.
+
+    """
+    if index is None:
+        index = clang.cindex.Index.create()
+    tu = index.parse(header,
+                     args = compiler_args(include_dirs, language) +
+                            list(extra_args or []),
+                     options = clang.cindex.TranslationUnit.PARSE_INCOMPLETE)
+    tu.save(pch_path)
+    includes = [header] + [os.fsdecode(inc.include.name)
+                           for inc in tu.get_includes()]
+    return PrecompiledPrefix(header, pch_path, includes)
+
+
 class ClangParser(object):
     """ Parses source file into a list of file-level c_ast nodes.
 
@@ -76,8 +143,9 @@ class ClangParser(object):
         # before visiting children
         self.context = []
 
-        # `all` maps the unique ids from the xml to the c_ast
-        # node that was generated by the element. This is used
+        # `all` maps the cursor_key of the parsed cursors to the c_ast
+        # node that was generated by the element. (clang's cursor hashes
+        # aren't unique, different cursors collide.) This is used
         # after all nodes have been generated to go back and
         # hook up dependent nodes.
         self.all = {}
@@ -95,48 +163,110 @@ class ClangParser(object):
         # `cvs_revision` stores the gccxml version in use.
         self.cvs_revision = None
 
+        # `children` maps the cursor_key of cursors to the list of
+        # their children while parsing, see build_child_map.
+        self.children = {}
+
+        # `scope` is the ScopePolicy restricting the files declarations
+        # are taken from, `file_scope` caches its decisions per file
+        # name. The header being parsed is `main_file`.
+        self.scope = None
+        self.file_scope = {}
+        self.main_file = None
+
+        # `macro_enum` is the anonymous Enumeration the integer macro
+        # constants of a file are added to as long as no other node
+        # comes between them, see visit_MACRO_DEFINITION.
+        self.macro_enum = None
+
+        # `dependencies` collects the out of scope declarations parsed
+        # on demand in the dependency closure mode until they are added
+        # to the translation unit, see parse_dependency.
+        self.dependencies = []
+
+        # `includes` lists the paths of all files included by the
+        # parsed translation unit.
+        self.includes = []
+
+        # `type_cache` maps clang types to the (c_ast type, id) tuple
+        # type_to_c_ast_type converted them to. `fallback_types` counts
+        # the types that couldn't be converted, which aren't cached.
+        self.type_cache = {}
+        self.fallback_types = 0
+
+        # `debug` guards the trace output whose arguments are costly
+        # to compute (e.g. need another call into libclang).
+        self.debug = logger.isEnabledFor(logging.DEBUG)
+
     #--------------------------------------------------------------------------
     # Parsing entry points
     #--------------------------------------------------------------------------
-    def parse(self, cfile, include_dirs, language, unsaved_files=None):
+    parse_options = (clang.cindex.TranslationUnit.PARSE_INCOMPLETE +
+                     clang.cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES)
+    # the macro definitions are only recorded if they are needed, as
+    # the record holds every definition and expansion of every file
+    macro_parse_options = (parse_options +
+                           clang.cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD)
+
+    def parse(self, cfile, include_dirs, language, unsaved_files=None,
+              index=None, prefix=None, scope=None, tus=None,
+              extra_args=None, macros=False):
         """ Parsing entry point. `cfile` is a filename or a file
-        object.
+        object. `index` is the clang Index to parse in, a new one is
+        created if it's None. `prefix` is an optional PrecompiledPrefix
+        and `scope` an optional ScopePolicy. If `tus` (a
+        TranslationUnitCache) is given, the translation unit is taken
+        from it instead of being parsed from scratch. `extra_args` are
+        more arguments passed to libclang (e.g. defines). If `macros`
+        is True, the #define constants are parsed too (see the macros
+        module).
 
         """
-        args_include_dirs = ['-I'+d for d in include_dirs]
-        args_language = ['-x'+language if language else '']
-                
-        index = clang.cindex.Index.create()
-        tu = index.parse(cfile,
-                         args = args_include_dirs + args_language, 
-                         #args = ['-I/usr/include/c++/4.2.1',],
-                         options = clang.cindex.TranslationUnit.PARSE_INCOMPLETE + \
-                             clang.cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD + \
-                             clang.cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES,
-                         unsaved_files = unsaved_files
-                         )
+        self.scope = scope
+        self.main_file = os.path.abspath(cfile)
+        args = compiler_args(include_dirs, language) + list(extra_args or [])
+        if prefix is not None:
+            args += prefix.args()
+        options = self.macro_parse_options if macros else self.parse_options
+        if tus is not None:
+            tu = tus.parse(cfile, args, options, unsaved_files)
+        else:
+            if index is None:
+                index = clang.cindex.Index.create()
+            tu = index.parse(cfile,
+                             args = args,
+                             #args = ['-I/usr/include/c++/4.2.1',],
+                             options = options,
+                             unsaved_files = unsaved_files
+                             )
 
         for d in tu.diagnostics:
             self.print_diag_info(d)
+
+        self.includes = [os.fsdecode(inc.include.name)
+                         for inc in tu.get_includes()]
         
         #UGLY: first element is TRANSLATION_UNIT, parse children
+        self.build_child_map(tu.cursor)
         ast = self.parse_element(tu.cursor) 
         #for c in tu.cursor.get_children():
         #    self.parse_element(c)
+        self.children = {}
         return ast
 
 
     def print_diag_info(self, diag):
-        print('category name:', diag.category_name)
-        print('location:', diag.location.file, diag.location.line, ':', diag.location.column)
-        print('severity:', diag.severity)
-        print('spelling:', diag.spelling)
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info('category name: %s', diag.category_name)
+        logger.info('location: %s %s : %s', diag.location.file, diag.location.line, diag.location.column)
+        logger.info('severity: %s', diag.severity)
+        logger.info('spelling: %s', diag.spelling)
         #print 'ranges:', list(diag.ranges)
         #print 'fixits', list(diag.fixits)
-        print('fixits', ['%d:%d-%d:%d %s'%(f.range.start.line, f.range.start.column, 
-                                           f.range.end.line, f.range.end.column,
-                                           f.value) for f in diag.fixits])
-        print()
+        logger.info('fixits %s', ['%d:%d-%d:%d %s'%(f.range.start.line, f.range.start.column, 
+                                                   f.range.end.line, f.range.end.column,
+                                                   f.value) for f in diag.fixits])
 
 
     simple_types = {TypeKind.VOID: 'void',
@@ -165,9 +295,27 @@ class ClangParser(object):
 
     def type_to_c_ast_type(self, t, level, recurse = True):
         #convert clang type to c_ast type, return c_ast and hash value for corresponding cursor (or None)
-        level.show( 'in type to c_ast:', 'kind:', t.kind, repr(t.get_declaration().spelling))
+        #clang uniques its types, so the kind and the opaque type pointer
+        #(which includes the cv-qualifiers) identify a type in the TU and
+        #the converted c_ast type can be shared by all its uses.
+        key = (t._kind_id, t.data[0], recurse)
+        try:
+            return self.type_cache[key]
+        except KeyError:
+            pass
+        fallbacks = self.fallback_types
+        result = self._type_to_c_ast_type(t, level, recurse)
+        #types that were given up on may be repaired later (see
+        #repair_type), don't share them
+        if self.fallback_types == fallbacks:
+            self.type_cache[key] = result
+        return result
 
+    def _type_to_c_ast_type(self, t, level, recurse):
         kind = t.kind
+        if self.debug:
+            level.show('in type to c_ast: kind: %s %r', kind, t.get_declaration().spelling)
+
         if kind in self.simple_types:
             const = t.is_const_qualified()
             volatile = t.is_volatile_qualified()
@@ -179,6 +327,10 @@ class ClangParser(object):
             return c_ast.ArrayType(a, 0, t.element_count-1), None
 
         elif kind is TypeKind.TYPEDEF:
+            if self.scope is not None and self.scope.closure:
+                # the typedef is referred to by name, but it has to be
+                # emitted too
+                self.parse_dependency(t.get_declaration(), level+1)
             const = t.is_const_qualified()
             volatile = t.is_volatile_qualified()
             fundtype = c_ast.FundamentalType(t.get_declaration().spelling)
@@ -199,13 +351,13 @@ class ClangParser(object):
 
         elif kind is TypeKind.ENUM:
             #see if declaration already parsed
-            typ = self.all.get(t.get_declaration().hash)
+            typ = self.all.get(cursor_key(t.get_declaration()))
             if typ is not None:
-                return typ, t.get_declaration().hash
+                return typ, cursor_key(t.get_declaration())
             else:
                 level.show('enum declaration not yet parsed')
-                typ = self.parse_element(t.get_declaration(), level) #TODO ????
-                return typ, t.get_declaration().hash
+                typ = self.parse_dependency(t.get_declaration(), level) #TODO ????
+                return typ, cursor_key(t.get_declaration())
 
         elif kind is TypeKind.FUNCTIONPROTO:
             level.show('return type:')
@@ -223,22 +375,24 @@ class ClangParser(object):
         
         else:
             level.show('do not know to handle type kind, search for declaration')
-            typ = self.all.get(t.get_declaration().hash)
+            typ = self.all.get(cursor_key(t.get_declaration()))
 
             #print 'in type_to_c_ast_type:'
             #print 'parsed type', typ
             #print
 
             if typ is not None:
-                return typ, t.get_declaration().hash
+                return typ, cursor_key(t.get_declaration())
             else:
-                level.show("can't find declaration for type, parse type declaration", kind, t.get_declaration().kind)
+                if self.debug:
+                    level.show("can't find declaration for type, parse type declaration %s %s", kind, t.get_declaration().kind)
                 #print
-                typ = self.parse_element(t.get_declaration(), level+1)
+                typ = self.parse_dependency(t.get_declaration(), level+1)
                 if typ is not None:
-                    return typ, t.get_declaration().hash
+                    return typ, cursor_key(t.get_declaration())
                 else:
                     #raise Exception 
+                    self.fallback_types += 1
                     if kind is TypeKind.UNEXPOSED:
                         return c_ast.FundamentalType('unexposed_type'), None
 
@@ -247,15 +401,159 @@ class ClangParser(object):
                 
         
 
+    # cursor kinds whose children are parsed by parse_element
+    container_kinds = frozenset([
+        #CursorKind.MACRO_DEFINITION,
+        CursorKind.TRANSLATION_UNIT,
+        CursorKind.NAMESPACE,
+        CursorKind.ENUM_DECL,
+        CursorKind.STRUCT_DECL,
+        CursorKind.UNION_DECL,
+        CursorKind.CLASS_DECL,
+        CursorKind.CLASS_TEMPLATE,
+        CursorKind.FUNCTION_TEMPLATE,
+        CursorKind.FIELD_DECL,
+        CursorKind.PARM_DECL,
+        CursorKind.CONSTRUCTOR,
+        CursorKind.CXX_METHOD,
+        # Functions handle their children (arguments) themselves and
+        # not using the standard way of parsing. This make sense as
+        # it can quite complex for function pointers (where some
+        # arguments belong to the function declaration, some to the
+        # function prototype).
+        #CursorKind.FUNCTION_DECL,
+        ])
+
+    def build_child_map(self, tu_cursor):
+        """ Collects the children of every cursor parse_element descends
+        into in a single recursive pass over the translation unit. With
+        a scope, only the in scope toplevel declarations are descended
+        into.
+
+        """
+        key = cursor_key(tu_cursor)
+        if self.scope is None:
+            self.children = tu_cursor.get_children_map(self.container_kinds)
+            self.children[key] = self.source_order(self.children[key])
+            return
+
+        # declarations from out of scope files are only parsed when
+        # type_to_c_ast_type needs them
+        toplevel = [c for c in tu_cursor.get_children() if self.in_scope(c)]
+        self.children = {key: self.source_order(toplevel)}
+        for c in toplevel:
+            if c.kind in self.container_kinds:
+                self.children.update(c.get_children_map(self.container_kinds))
+
+    def source_order(self, toplevel):
+        """ Returns the `toplevel` cursors with every macro definition
+        moved in front of the first declaration following it in its
+        file, as libclang lists the preprocessing cursors before all
+        declarations.
+
+        """
+        macros = {}
+        preprocessing = []
+        declarations = []
+        for c in toplevel:
+            kind = c.snapshot().kind
+            if kind is CursorKind.MACRO_DEFINITION:
+                macros.setdefault(c.snapshot().file_name, []).append(c)
+            elif kind.is_preprocessing():
+                preprocessing.append(c)
+            else:
+                declarations.append(c)
+        if not macros:
+            return toplevel
+
+        ordered = preprocessing
+        for c in declarations:
+            info = c.snapshot()
+            pending = macros.get(info.file_name)
+            if pending:
+                i = 0
+                while i < len(pending) and \
+                        pending[i].snapshot().line < info.line:
+                    i += 1
+                ordered.extend(pending[:i])
+                del pending[:i]
+            ordered.append(c)
+        # the macros after the last declaration of their file
+        for pending in macros.values():
+            ordered.extend(pending)
+        return ordered
+
+    def get_children(self, cursor):
+        """ Returns the list of children of `cursor`.
+
+        """
+        children = self.children.get(cursor_key(cursor))
+        if children is None:
+            # a cursor the pass of build_child_map didn't reach, e.g. a
+            # declaration inside a function
+            children = list(cursor.get_children())
+        return children
+
+    def in_scope(self, cursor):
+        """ Returns True if `cursor` is located in a file which is in
+        the scope of the parser.
+
+        """
+        name = cursor.snapshot().file_name
+        if name is None:
+            return True
+        try:
+            return self.file_scope[name]
+        except KeyError:
+            pass
+        in_scope = (os.path.abspath(os.fsdecode(name)) == self.main_file or
+                    self.scope.contains(
+                        name, cursor.location.is_in_system_header))
+        self.file_scope[name] = in_scope
+        return in_scope
+
+    def parse_dependency(self, cursor, level):
+        """ Parses the declaration `cursor` a type refers to. In the
+        dependency closure mode, a toplevel declaration from an out of
+        scope file is queued to be emitted before the declaration that
+        needed it.
+
+        """
+        if self.scope is None or not self.scope.closure or \
+                cursor_key(cursor) in self.all or \
+                cursor.semantic_parent.kind is not CursorKind.TRANSLATION_UNIT \
+                or self.in_scope(cursor):
+            return self.parse_element(cursor, level)
+
+        # the declaration belongs to the translation unit, not to the
+        # declaration being parsed
+        self.context.append(self.context[0])
+        node = self.parse_element(cursor, level)
+        self.context.pop()
+        if node is not None:
+            self.dependencies.append(node)
+        return node
+
     def parse_element(self, cursor, level = Level()):
         
         #level.show('file:', repr(cursor.location.file))
+        # kind, spelling and location in one go
+        info = cursor.snapshot()
+        kind = info.kind
         # ignore builtin nodes
-        if cursor.location.file is None and cursor.kind is not CursorKind.TRANSLATION_UNIT:
+        if info.file_name is None and kind is not CursorKind.TRANSLATION_UNIT:
             return
 
+        # declarations which type_to_c_ast_type already parsed on demand
+        # (and inline structs, which are also children of their field)
+        # are parsed only once
+        key = cursor_key(cursor)
+        node = self.all.get(key)
+        if node is not None:
+            return node
+
         # Find and call visitor
-        mth = getattr(self, 'visit_' + cursor.kind.name, None)
+        mth = getattr(self, 'visit_' + kind.name, None)
         if mth is not None:
             result = mth(cursor, level)
         else:
@@ -265,46 +563,30 @@ class ClangParser(object):
         # used in the _fixup_* methods. Some elements don't have
         # an id, so we create our own.
         if result is not None:
-            location = cursor.location
-            if location.file is not None:
-                result.location = (location.file.name, location.line)
+            if info.file_name is not None:
+                result.location = (info.file_name, info.line)
 
-            self.all[cursor.hash] = result
+            self.all[key] = result
 
         #debug output
-        if result is not None:
-            level.show('cursor:', cursor.kind, str(cursor.type.kind))
-            level.show('name:', repr(result.name))
-            print()
+        if result is not None and self.debug:
+            level.show('cursor: %s %s', kind, cursor.type.kind)
+            level.show('name: %r', result.name)
         
 
         # if this element has subelements, push it onto the context
         # since the next elements will be it's children.
-        if cursor.kind in [
-            #CursorKind.MACRO_DEFINITION,
-            CursorKind.TRANSLATION_UNIT,
-            CursorKind.NAMESPACE,
-            CursorKind.ENUM_DECL,
-            CursorKind.STRUCT_DECL,
-            CursorKind.UNION_DECL,
-            CursorKind.CLASS_DECL,
-            CursorKind.CLASS_TEMPLATE,
-            CursorKind.FUNCTION_TEMPLATE,
-            CursorKind.FIELD_DECL,
-            CursorKind.PARM_DECL,
-            CursorKind.CONSTRUCTOR,
-            CursorKind.CXX_METHOD,
-            # Functions handle their children (arguments) themselves and
-            # not using the standard way of parsing. This make sense as
-            # it can quite complex for function pointers (where some
-            # arguments belong to the function declaration, some to the
-            # function prototype).
-            #CursorKind.FUNCTION_DECL,
-                           ]:
+        if kind in self.container_kinds:
             self.context.append(result)
 
-            for c in cursor.get_children():
+            for c in self.get_children(cursor):
                 child = self.parse_element(c, level+1)
+                if self.dependencies and \
+                        kind is CursorKind.TRANSLATION_UNIT:
+                    # emit the declarations `child` depends on first
+                    for dependency in self.dependencies:
+                        result.add_child(dependency)
+                    self.dependencies = []
                 if child is not None and hasattr(result, 'add_child'):
                     result.add_child(child)
                 
@@ -332,11 +614,12 @@ class ClangParser(object):
 
         #level.show('file:', repr(cursor.location.file))
         # ignore builtin nodes
-        if cursor.location.file is None:
+        if cursor.snapshot().file_name is None:
             return
 
         #print 'Unhandled element `%s`.' % cursor.displayname
-        level.show('unhandled element', repr(cursor.spelling), repr(cursor.displayname), cursor.kind)
+        if self.debug:
+            level.show('unhandled element %r %r %s', cursor.spelling, cursor.displayname, cursor.kind)
         #print
 
     #--------------------------------------------------------------------------
@@ -419,7 +702,7 @@ class ClangParser(object):
     def visit_TYPEDEF_DECL(self, cursor, level):
         c_ast_type, id_ = self.type_to_c_ast_type(cursor.underlying_typedef_type, level)
         if c_ast_type is not None:
-            level.show('in visit_TYPEDEF_DECL, c_ast_type =', c_ast_type.__class__.__name__, 'name =', repr(c_ast_type.name))
+            level.show('in visit_TYPEDEF_DECL, c_ast_type = %s name = %r', c_ast_type.__class__.__name__, c_ast_type.name)
             
             #special handling of typedef enum, struct, union
             if type(c_ast_type) in (c_ast.Enumeration, c_ast.Union, c_ast.Struct):
@@ -432,13 +715,18 @@ class ClangParser(object):
 
                 if not c_ast_type.name: 
                     #unnamed record -> remove declaration from self.all 
-                    level.show('remove declaration', c_ast_type, self.all[id_])
+                    level.show('remove declaration %s %s', c_ast_type, self.all[id_])
                     try:
-                        idx = c_ast_type.context.members.index(c_ast_type)
-                        level.show('remove from parent, idx', idx)
-                        c_ast_type.context.members.pop(idx)
+                        c_ast.remove_member(c_ast_type.context.members,
+                                            c_ast_type)
+                        level.show('removed from parent')
                     except ValueError:
-                        level.show("not contained in parent", c_ast_type)
+                        level.show('not contained in parent %s', c_ast_type)
+                        try:
+                            c_ast.remove_member(self.dependencies,
+                                                c_ast_type)
+                        except ValueError:
+                            pass
 
                 elif c_ast_type.name == cursor.spelling:
                     #enum tagname == typename: no typedef, do nothing
@@ -459,10 +747,10 @@ class ClangParser(object):
         # If a field has struct as a child, use the field name as the
         # structs name (in case it hasn't one). This way anonymous structs
         # and unions get a proper mangled name for Cython.
-        children = list(cursor.get_children())
+        children = self.get_children(cursor)
         if len(children) == 1 and children[0].kind in \
                 [CursorKind.STRUCT_DECL, CursorKind.UNION_DECL]:
-            node = self.all[children[0].hash]
+            node = self.all[cursor_key(children[0])]
             if not node.name:
                 node.name = cursor.spelling
         parent = self.context[-1]
@@ -485,7 +773,8 @@ class ClangParser(object):
         returntype, id_ = self.type_to_c_ast_type(cursor.type.get_result(), level)
         func = c_ast.Function(name, returntype)
         for arg in cursor.get_arguments():
-            level.show('function argument', arg.kind, arg.spelling)
+            if self.debug:
+                level.show('function argument %s %r', arg.kind, arg.spelling)
             func.add_argument(c_ast.Argument(arg.spelling, self.type_to_c_ast_type(arg.type, level+1)[0]))
         return func
 
@@ -528,7 +817,8 @@ class ClangParser(object):
         typ, id = self.type_to_c_ast_type(cursor.type, level)
         parent = self.context[-1]
         if parent is not None:
-            level.show('TYPE REF', repr(cursor.displayname), 'parent: %s, type: %s'%(parent, cursor.type.kind))
+            if self.debug:
+                level.show('TYPE REF %r parent: %s, type: %s', cursor.displayname, parent, cursor.type.kind)
 
             if cursor.type.kind is TypeKind.UNEXPOSED:
                 #fix type of parent
@@ -541,7 +831,52 @@ class ClangParser(object):
         if hasattr(parent, 'add_template_parameter'):
             parent.add_template_parameter(param)
         else:
-            level.show('TEMPLATE_TYPE_PARAMETER: unknown parent', parent)
+            level.show('TEMPLATE_TYPE_PARAMETER: unknown parent %s', parent)
+
+    def visit_MACRO_DEFINITION(self, cursor, level):
+        # with a scope, build_child_map only keeps the macros of the
+        # files in scope
+        if self.scope is None:
+            name = cursor.snapshot().file_name
+            if os.path.abspath(os.fsdecode(name)) != self.main_file:
+                return None
+        tokens = list(cursor.get_tokens())
+        if len(tokens) < 2:
+            return None
+        # function-like macros have the parenthesis right after the name
+        if tokens[1].spelling == b'(' and \
+                tokens[1].extent.start.offset == tokens[0].extent.end.offset:
+            return None
+        name = tokens[0].spelling
+        spellings = [t.spelling for t in tokens[1:]]
+        kind = constant_kind(spellings)
+        if kind == INTEGER:
+            value = c_ast.EnumValue(name, b' '.join(spellings))
+            # consecutive constants of a file share an enum (see
+            # source_order for the order of the macros)
+            if self.macro_enum is not None and \
+                    next(reversed(self.all.values())) is self.macro_enum \
+                    and self.macro_enum.location[0] == \
+                    cursor.snapshot().file_name:
+                self.macro_enum.add_value(value)
+                return None
+            self.macro_enum = c_ast.Enumeration(b'', self.context[-1])
+            self.macro_enum.add_value(value)
+            return self.macro_enum
+        if kind == FLOAT:
+            typ = c_ast.CvQualifiedType(c_ast.FundamentalType('double'),
+                                        True, False)
+        elif kind == STRING:
+            typ = c_ast.PointerType(
+                c_ast.CvQualifiedType(c_ast.FundamentalType('char'),
+                                      True, False), None, None)
+        else:
+            return None
+        return c_ast.Variable(name, typ, None, None)
+
+    # only the definitions are of interest
+    visit_MACRO_INSTANTIATION = lambda *args: None
+    visit_INCLUSION_DIRECTIVE = lambda *args: None
 
     def visit_Namespace(self, attrs):
         name = attrs['name']
@@ -776,23 +1111,6 @@ class ClangParser(object):
     #--------------------------------------------------------------------------
     # Post parsing helpers
     #--------------------------------------------------------------------------
-    def get_macros(self, text):
-        """ Attempts to extract the macros from a piece of text
-        and converts it to a Macro node containing the name,
-        args, and body.  
-
-        """
-        if text is None:
-            return
-        
-        # join and split so we can accept a list or  string. 
-        text = ''.join(text)
-        for m in text.splitlines():
-            name, body = m.split(None, 1)
-            name, args = name.split('(', 1)
-            args = '(%s' % args
-            self.all[name] = c_ast.Macro(name, args, body)
-
     def get_aliases(self, text, namespace):
         """ Attemps to extract defined aliases of the form
         #define A B and store them in an Alias node.
@@ -827,9 +1145,6 @@ class ClangParser(object):
         internal stuff that you wont want.
 
         """
-        
-        # Gather any macros.
-        self.get_macros(self.cpp_data.get('functions'))
 
         # Walk through all the items, hooking up the appropriate 
         # links by replacing the id tags with the actual objects
@@ -884,22 +1199,62 @@ class ClangParser(object):
 # `cfile` can be a 2-tuple with a virtual file name and the file contents.
 # The contents can either be a string or a file-like object (with a read()
 # method).
-def parse(cfile, include_dirs, language):
-    parser = ClangParser()
+# If `cache_dir` is given, the parse results are stored in and loaded from
+# a ParseCache living in that directory.
+# `index`, `prefix`, `scope`, `tus`, `extra_args` and `macros` are passed
+# along to ClangParser.parse.
+def parse(cfile, include_dirs, language, cache_dir=None, index=None,
+          prefix=None, scope=None, tus=None, extra_args=None, macros=False):
+    return parse_with_includes(cfile, include_dirs, language, cache_dir,
+                               index, prefix, scope, tus, extra_args,
+                               macros)[0]
+
+
+# Like parse, but returns a (items, includes) tuple. `includes` lists the
+# paths of all files the header included.
+def parse_with_includes(cfile, include_dirs, language, cache_dir=None,
+                        index=None, prefix=None, scope=None, tus=None,
+                        extra_args=None, macros=False):
+    unsaved_files = None
     if isinstance(cfile, list):
-        parser.parse(cfile[0][0], include_dirs, language, unsaved_files=cfile)
-    else:
-        parser.parse(cfile, include_dirs, language)
+        unsaved_files = [(name, contents.read() if hasattr(contents, 'read')
+                          else contents) for name, contents in cfile]
+        cfile = cfile[0][0]
+
+    if cache_dir is not None:
+        cache = ParseCache(cache_dir)
+        args = compiler_args(include_dirs, language) + list(extra_args or [])
+        if prefix is not None:
+            args += prefix.key_args()
+        if scope is not None:
+            args += scope.key_args()
+        if macros:
+            args += ['--cwrap-macros']
+        cached = cache.lookup(cfile, args, unsaved_files)
+        if cached is not None:
+            return cached
 
-    print('all:')
-    for a in parser.all:
-        print(hex(a), parser.all[a].name)
-    print()
+    parser = ClangParser()
+    parser.parse(cfile, include_dirs, language, unsaved_files=unsaved_files,
+                 index=index, prefix=prefix, scope=scope, tus=tus,
+                 extra_args=extra_args, macros=macros)
+
+    if parser.debug:
+        logger.debug('all:')
+        for a in parser.all:
+            logger.debug('%s %s', a, parser.all[a].name)
 
     items = parser.get_result()
 
-    print('in clang_parser.py/parse(), items:')
-    for i in items:
-        print("%20s: %s"%(i.__class__.__name__, i.name))
+    if parser.debug:
+        logger.debug('in clang_parser.py/parse(), items:')
+        for i in items:
+            logger.debug('%20s: %s', i.__class__.__name__, i.name)
+
+    includes = parser.includes
+    if prefix is not None:
+        includes = includes + prefix.includes
+    if cache_dir is not None:
+        cache.store(cfile, args, unsaved_files, includes, items)
 
-    return items
+    return items, includes
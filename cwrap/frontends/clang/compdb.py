@@ -0,0 +1,207 @@
+""" Compiler flags of headers from a compilation database.
+
+With the `compile_commands` option (a compile_commands.json file or the
+build directory containing it), every header is parsed with the flags
+of its compile command: defines, -std, -isystem, target flags, ... A
+header usually doesn't have a command of its own, it gets the flags of
+
+* its own command, if there is one
+* else the command of a source file with the same name in the same
+  directory (foo.c for foo.h)
+* else the command of a source file in the same directory
+* else the command of a source file with the same name in another
+  directory, the one closest to the header (src/foo.c for
+  include/foo.h)
+* else no flags at all, the flags of an unrelated command could change
+  the generated code
+
+The output, dependency, input and precompiled header arguments are
+dropped, relative paths are made absolute.
+
+"""
+# Stdlib imports
+from collections import OrderedDict
+import os
+
+# Local package imports
+from .clang import cindex
+from ...log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+# arguments dropped together with the value following them. The
+# precompiled header of the build may not fit libclang (or not exist).
+_SKIP_WITH_VALUE = frozenset(['-o', '-MF', '-MT', '-MQ', '-Xclang',
+                              '-include-pch'])
+# arguments dropped
+_SKIP = frozenset(['-c', '-M', '-MM', '-MD', '-MMD', '-MG', '-MP', '-E',
+                   '-S'])
+# arguments whose value is a path, relative to the directory of the
+# command. The value follows as the next argument or is joined to them
+# (`-Idir`, `--sysroot=dir`).
+_PATH_ARGS = ('-I', '-F', '-isystem', '-iquote', '-idirafter', '-iframework',
+              '-include', '-imacros', '-isysroot', '--sysroot', '-iprefix')
+# arguments whose value follows as the next argument and is passed as it
+# is; the -iwith* paths are relative to the -iprefix or the sysroot
+_VALUE_ARGS = frozenset(['-iwithprefix', '-iwithprefixbefore',
+                         '-iwithsysroot', '-iframeworkwithsysroot',
+                         '-isystem-after', '-Xpreprocessor', '-x',
+                         '-target', '-arch'])
+
+
+DATABASE_NAME = 'compile_commands.json'
+
+
+def database_path(path):
+    """ Returns the absolute path of the compile_commands.json file
+    `path`, which may be the directory containing it.
+
+    """
+    path = os.path.abspath(path)
+    if os.path.isdir(path):
+        path = os.path.join(path, DATABASE_NAME)
+    return path
+
+
+def load(path):
+    """ Loads the compilation database `path`, a compile_commands.json
+    file or the directory containing it.
+
+    """
+    directory = os.path.dirname(database_path(path))
+    return cindex.CompilationDatabase.fromDirectory(directory)
+
+
+def command_args(command):
+    """ Returns the arguments of the CompileCommand `command` which are
+    passed to libclang.
+
+    """
+    directory = command.directory
+    source = os.path.normpath(os.path.join(directory, command.filename))
+    arguments = list(command.arguments)[1:]
+
+    def absolute(path):
+        result = os.path.normpath(os.path.join(directory, path))
+        # an -iprefix is prepended to the -iwithprefix paths as it is
+        if path.endswith(os.sep):
+            result += os.sep
+        return result
+
+    args = []
+    skip = False
+    value_of = None
+    for arg in arguments:
+        if skip:
+            skip = False
+            continue
+        if value_of is not None:
+            # the value of e.g. `-I dir`
+            args.append(absolute(arg) if value_of in _PATH_ARGS else arg)
+            value_of = None
+            continue
+        if arg in _SKIP_WITH_VALUE:
+            skip = True
+            continue
+        if arg in _SKIP or arg.startswith('-MF') or arg.startswith('-o'):
+            continue
+        if arg in _PATH_ARGS or arg in _VALUE_ARGS:
+            args.append(arg)
+            value_of = arg
+            continue
+        if arg.startswith('-'):
+            args.append(_joined_path_arg(arg, absolute))
+        elif absolute(arg) != source:
+            args.append(arg)
+    return args
+
+
+def _joined_path_arg(arg, absolute):
+    # the longest matching option, `-isystemdir` isn't `-I` with the
+    # value `systemdir`
+    for path_arg in sorted(_PATH_ARGS, key=len, reverse=True):
+        value = arg[len(path_arg):]
+        if not arg.startswith(path_arg) or not value:
+            continue
+        if value.startswith('='):
+            value = value[1:]
+            path_arg += '='
+        if not value or value.startswith('-'):
+            # another option, e.g. -isystem-after
+            return arg
+        return path_arg + absolute(value)
+    return arg
+
+
+class CompileFlags(object):
+    """ Finds the compiler flags of headers in the compilation database
+    `path`.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self.db_path = database_path(path)
+        self.db = load(path)
+        # the commands of the database by source file
+        self.commands = OrderedDict()
+        for command in self.db.getAllCompileCommands() or []:
+            source = os.path.normpath(os.path.join(command.directory,
+                                                   command.filename))
+            self.commands.setdefault(source, command)
+
+    def find_command(self, header):
+        """ Returns a (source, CompileCommand) tuple for the command
+        whose flags `header` is parsed with, (None, None) if there is
+        none (see the module docstring for the order they are looked
+        for in).
+
+        """
+        header = os.path.abspath(header)
+        command = self.commands.get(header)
+        if command is not None:
+            return header, command
+        directory, name = os.path.split(header)
+        stem = os.path.splitext(name)[0]
+        same_dir = []
+        same_stem = []
+        for source, command in self.commands.items():
+            source_dir, source_name = os.path.split(source)
+            if os.path.splitext(source_name)[0] == stem:
+                if source_dir == directory:
+                    return source, command
+                same_stem.append((source, command))
+            elif source_dir == directory:
+                same_dir.append((source, command))
+        if same_dir:
+            return same_dir[0]
+        if same_stem:
+            # the closest one, not the first one in the database
+            return min(same_stem, key=lambda item: (
+                -len(os.path.commonpath([item[0], header])), item[0]))
+        return None, None
+
+    def header_args(self, header):
+        """ Returns the arguments `header` is parsed with.
+
+        """
+        source, command = self.find_command(header)
+        if command is None:
+            logger.info('No compile command for %s, parsing it without '
+                        'flags', header)
+            return []
+        logger.info('Parsing %s with the flags of %s', header, source)
+        return command_args(command)
+
+
+def group_by_args(files, args_of):
+    """ Groups `files` by the arguments `args_of(file)` they are parsed
+    with. Returns a list of (args, files) tuples in the order the
+    arguments first appear.
+
+    """
+    groups = OrderedDict()
+    for header_file in files:
+        groups.setdefault(tuple(args_of(header_file)), []).append(header_file)
+    return [(list(args), group) for args, group in groups.items()]
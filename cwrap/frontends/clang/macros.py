@@ -0,0 +1,53 @@
+""" The #define constants of the clang frontend.
+
+With the ``macros`` option, the object-like macros whose replacement is
+a constant are declared too:
+
+* integer constant expressions (e.g. ``42``, ``(1u << 3 | 0x10)``) as
+  values of an anonymous enum
+* floating point constant expressions as ``const double``
+* string literals (adjacent ones are concatenated) as ``const char *``
+
+Other macros (function-like ones, ones referring to other macros or
+identifiers, empty ones) are skipped. Macros are taken from the header
+being parsed, or from the files in scope if a scope is configured (see
+the scope module).
+
+"""
+# Stdlib imports
+import re
+
+
+INTEGER = 'integer'
+FLOAT = 'float'
+STRING = 'string'
+
+_INTEGER = re.compile(br'^(0[xX][0-9a-fA-F]+|0[bB][01]+|[0-9]+)[uUlL]*$')
+_FLOAT = re.compile(br'^([0-9]+\.[0-9]*|\.[0-9]+|[0-9]+(?=[eE]))'
+                    br'([eE][+-]?[0-9]+)?[fFlL]?$')
+_STRING = re.compile(br'^(L|u8|u|U)?"')
+# the operators of the constant expressions
+_OPERATORS = frozenset([b'(', b')', b'+', b'-', b'*', b'/', b'%', b'<<',
+                        b'>>', b'|', b'&', b'^', b'~'])
+
+
+def constant_kind(spellings):
+    """ Returns INTEGER, FLOAT or STRING if the token `spellings` of the
+    replacement of a macro are a constant of that kind, None otherwise.
+
+    """
+    if not spellings:
+        return None
+    if all(_STRING.match(spelling) for spelling in spellings):
+        return STRING
+    kind = None
+    for spelling in spellings:
+        if spelling in _OPERATORS:
+            continue
+        if _INTEGER.match(spelling):
+            kind = kind or INTEGER
+        elif _FLOAT.match(spelling):
+            kind = FLOAT
+        else:
+            return None
+    return kind
@@ -0,0 +1,86 @@
+""" The scope policy of the clang frontend.
+
+By default the declarations of every file a header includes are
+wrapped. The scope options of Config restrict them to a set of files:
+
+* ``include_headers``: glob patterns, only files matching one of them
+  are in scope
+* ``exclude_headers``: glob patterns of files which are out of scope
+* ``skip_system_headers``: files in system include directories are out
+  of scope
+* ``allow_headers``: glob patterns of files which are always in scope
+* ``dependency_closure``: only the header being parsed (and the allowed
+  files) are in scope, the declarations from other files are emitted
+  only if the in scope declarations depend on them
+
+The patterns are matched against the absolute path of the files. The
+header being parsed is always in scope. Declarations from out of scope
+files are still parsed when an in scope declaration refers to them.
+
+"""
+# Stdlib imports
+import fnmatch
+import os
+
+
+class ScopePolicy(object):
+    """ Decides which files the declarations given to cwrap are taken
+    from.
+
+    """
+    def __init__(self, include=None, exclude=None, skip_system_headers=False,
+                 allow=None, closure=False):
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.skip_system_headers = bool(skip_system_headers)
+        self.allow = list(allow or [])
+        # if `closure` is True, the parser emits the out of scope
+        # declarations the in scope ones depend on
+        self.closure = bool(closure)
+
+    @classmethod
+    def from_metadata(cls, metadata):
+        """ Returns the policy configured by the options `metadata` of a
+        Config, or None if they don't restrict the scope.
+
+        """
+        policy = cls(metadata.get('include_headers'),
+                     metadata.get('exclude_headers'),
+                     metadata.get('skip_system_headers'),
+                     metadata.get('allow_headers'),
+                     metadata.get('dependency_closure'))
+        if not (policy.include or policy.exclude or
+                policy.skip_system_headers or policy.closure):
+            return None
+        return policy
+
+    def key_args(self):
+        """ The arguments identifying the policy in the parse cache.
+
+        """
+        return ['--cwrap-scope=%r' % ((self.include, self.exclude,
+                                       self.skip_system_headers,
+                                       self.allow, self.closure),)]
+
+    def _matches(self, path, patterns):
+        for pattern in patterns:
+            if fnmatch.fnmatch(path, pattern):
+                return True
+        return False
+
+    def contains(self, path, in_system_header=False):
+        """ Returns True if the declarations of the file `path` are in
+        scope. `in_system_header` tells whether the file is a system
+        header.
+
+        """
+        path = os.path.abspath(os.fsdecode(path))
+        if self._matches(path, self.allow):
+            return True
+        if self.closure:
+            return False
+        if self.skip_system_headers and in_system_header:
+            return False
+        if self.include and not self._matches(path, self.include):
+            return False
+        return not self._matches(path, self.exclude)
@@ -0,0 +1,91 @@
+""" An in-memory cache of clang translation units.
+
+A process generating the same headers again and again (e.g. the cwrap
+server) keeps their translation units. A header requested again is
+reparsed by libclang only if the header or one of the files it includes
+changed since. The translation units are parsed with a precompiled
+preamble (the includes at the top of the header), so a reparse after a
+change of the header itself doesn't parse its includes again.
+
+"""
+# Stdlib imports
+from collections import OrderedDict
+import os
+
+# Local package imports
+from .clang.cindex import TranslationUnit
+from ...log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+# The default number of translation units kept in memory
+MAX_TRANSLATION_UNITS = 64
+
+
+def file_stamp(paths):
+    """ Returns the modification times of `paths`, None for the ones
+    which don't exist.
+
+    """
+    stamp = []
+    for path in paths:
+        try:
+            stamp.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            stamp.append(None)
+    return stamp
+
+
+def _inputs(path, tu):
+    return [path] + [os.fsdecode(inc.include.name)
+                     for inc in tu.get_includes()]
+
+
+class TranslationUnitCache(object):
+    """ Maps a (header, compiler args, parse options) tuple to the
+    translation unit parsed for it. At most `max_size` translation
+    units are kept, the least recently used are dropped first.
+
+    """
+    def __init__(self, index, max_size=MAX_TRANSLATION_UNITS):
+        self.index = index
+        self.max_size = max_size
+        # key -> (translation unit, input paths, stamp of the inputs)
+        self.entries = OrderedDict()
+
+    def parse(self, path, args, options, unsaved_files=None):
+        """ Returns the translation unit of `path`, parsed with the
+        compiler arguments `args` and the parse `options`. Translation
+        units of unsaved files aren't cached.
+
+        """
+        if unsaved_files:
+            return self.index.parse(path, args=args, options=options,
+                                    unsaved_files=unsaved_files)
+
+        key = (os.path.abspath(path), tuple(args), options)
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            logger.info('Parsing translation unit of %s', path)
+            tu = self.index.parse(
+                path, args=args,
+                options=options | TranslationUnit.PARSE_PRECOMPILED_PREAMBLE)
+            # libclang builds the preamble on the first reparse
+            tu.reparse()
+            inputs = _inputs(path, tu)
+            stamp = file_stamp(inputs)
+        else:
+            tu, inputs, stamp = entry
+            if file_stamp(inputs) != stamp:
+                logger.info('Reparsing translation unit of %s', path)
+                tu.reparse()
+                # the includes may have changed too
+                inputs = _inputs(path, tu)
+                stamp = file_stamp(inputs)
+
+        self.entries[key] = (tu, inputs, stamp)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return tu
@@ -1,7 +1,6 @@
 # Stdlib imports
 import os
 import subprocess
-import tempfile
 
 # Local package imports
 from . import ast_transforms as transforms
@@ -15,25 +14,41 @@ def gen_c_ast(header_path, include_dirs):
     gccxml.
 
     """
-    # A temporary file to store the xml generated by gccxml
-    xml_file = tempfile.NamedTemporaryFile(suffix='.xml', delete=False)
-    xml_file.close()
+    # gccxml writes the xml into a pipe, which is parsed while gccxml
+    # is still running. Its output isn't stored anywhere.
+    read_fd, write_fd = os.pipe()
 
     # buildup the gccxml command
     cmds = ['gccxml']
     for inc_dir in include_dirs:
         cmds.append('-I' + inc_dir)
     cmds.append(header_path)
-    cmds.append('-fxml=%s' % xml_file.name)
+    cmds.append('-fxml=/dev/fd/%d' % write_fd)
    
-    # we pipe stdout so the preprocessing doesn't dump to the 
-    # shell. We really don't care about it.
-    p = subprocess.Popen(cmds, stdout=subprocess.PIPE)
-    cpp, _ = p.communicate()
-    
-    # Parse the xml into the ast then delete the temp file
-    c_ast = gccxml_parser.parse(xml_file.name)
-    os.remove(xml_file.name)
+    # the preprocessing output would dump to the shell. We really
+    # don't care about it.
+    try:
+        p = subprocess.Popen(cmds, stdout=subprocess.DEVNULL,
+                             pass_fds=(write_fd,))
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        # only gccxml writes, the pipe ends when it exits
+        os.close(write_fd)
+
+    # Parse the xml into the ast as it arrives
+    try:
+        with os.fdopen(read_fd, 'rb') as xml_file:
+            c_ast = gccxml_parser.parse(xml_file)
+    except SyntaxError:
+        # no or truncated xml: report gccxml failing, not the xml
+        if p.wait() != 0:
+            raise RuntimeError('gccxml failed with exit code %d on %s'
+                               % (p.returncode, header_path))
+        raise
+    finally:
+        p.wait()
 
     return c_ast
 
@@ -50,12 +65,16 @@ def print_item(item, caption = '', level=0):
         print_item(i, '', level+1)
     #print
 
-def generate_asts(config):
-    """ Returns an iterable of ASTContainer objects.
+def generate_asts(config, files=None, lazy=False):
+    """ Returns an iterable of ASTContainer objects for `files` (by
+    default all files of the config). The modules are always
+    transformed before they are returned, `lazy` is ignored.
 
     """
+    if files is None:
+        files = config.files
     c_ast_containers = []
-    for header_file in config.files:
+    for header_file in files:
         # read the header info and create the extern and implemenation
         # module names
         path = header_file.path
@@ -1,7 +1,7 @@
 #------------------------------------------------------------------------------
 # This file is adapted from ctypeslib.codegen.gccxmlparser
 #------------------------------------------------------------------------------
-from xml.etree import cElementTree
+from xml.etree import ElementTree
 import os
 import sys
 import re
@@ -52,11 +52,21 @@ class GCCXMLParser(object):
         self.context = []
 
         # `all` maps the unique ids from the xml to the c_ast
-        # node that was generated by the element. This is used
-        # after all nodes have been generated to go back and
-        # hook up dependent nodes.
+        # node that was generated by the element. References to
+        # nodes already generated are hooked up right away.
         self.all = {}
 
+        # `pending` maps the ids of nodes not generated yet to the
+        # (node, attribute name) and (list, index) pairs referring to
+        # them, which are patched when the node is generated.
+        self.pending = {}
+
+        # `files` maps the ids of File elements to their names and
+        # `pending_locations` the ids of files not seen yet to the
+        # (node, line) pairs located in them.
+        self.files = {}
+        self.pending_locations = {}
+
         # XXX - what does this do?
         self.cpp_data = {}
 
@@ -72,12 +82,13 @@ class GCCXMLParser(object):
     #--------------------------------------------------------------------------
     def parse(self, xmlfile):
         """ Parsing entry point. `xmlfile` is a filename or a file
-        object.
+        object, which is parsed incrementally as it is read (e.g. a
+        pipe gccxml is still writing to).
 
         """
-        for event, node in cElementTree.iterparse(xmlfile, events=('start', 'end')):
+        for event, node in ElementTree.iterparse(xmlfile, events=('start', 'end')):
             if event == 'start':
-                self.start_element(node.tag, dict(list(node.items())))
+                self.start_element(node.tag, node.attrib)
             else:
                 if node.text:
                     self.visit_Characters(node.text)
@@ -87,7 +98,8 @@ class GCCXMLParser(object):
     def start_element(self, name, attrs):
         """ XML start element handler. Generates and calls the visitor 
         method name, registers the resulting node's id, and 
-        sets the location on the node.
+        sets the location on the node. `attrs` is the attribute dict
+        of the element, the visitors must not keep it.
 
         """
         # find and call the handler for this element
@@ -97,16 +109,23 @@ class GCCXMLParser(object):
         else:
             result = mth(attrs)
 
-        # Record the result and register the the id, which is
-        # used in the _fixup_* methods. Some elements don't have
+        # Record the result and register the the id, patching the
+        # nodes which referred to it before. Some elements don't have
         # an id, so we create our own.
         if result is not None:
-            location = attrs.get('location', None)
-            if location is not None:
-                result.location = location
+            file_id = attrs.get('file')
+            if file_id is not None:
+                self.set_location(result, file_id, int(attrs['line']))
             _id = attrs.get('id', None)
             if _id is not None:
                 self.all[_id] = result
+                patches = self.pending.pop(_id, None)
+                if patches is not None:
+                    for target, key in patches:
+                        if isinstance(key, int):
+                            target[key] = result
+                        else:
+                            setattr(target, key, result)
             else:
                 self.all[id(result)] = result
 
@@ -125,6 +144,44 @@ class GCCXMLParser(object):
             self.context.pop()
         self.cdata = None
 
+    def link(self, node, *names):
+        """ Replaces the ids in the attributes `names` of `node` with
+        the nodes they refer to, now or once those are generated.
+
+        """
+        for name in names:
+            ref = getattr(node, name)
+            target = self.all.get(ref)
+            if target is None:
+                self.pending.setdefault(ref, []).append((node, name))
+            else:
+                setattr(node, name, target)
+
+    def link_items(self, refs):
+        """ Replaces the ids in the list `refs` with the nodes they
+        refer to, now or once those are generated. Returns `refs`.
+
+        """
+        for i, ref in enumerate(refs):
+            target = self.all.get(ref)
+            if target is None:
+                self.pending.setdefault(ref, []).append((refs, i))
+            else:
+                refs[i] = target
+        return refs
+
+    def set_location(self, node, file_id, line):
+        """ Sets the location of `node`, once the name of the file
+        `file_id` is known.
+
+        """
+        name = self.files.get(file_id)
+        if name is None:
+            self.pending_locations.setdefault(file_id, []).append(
+                (node, line))
+        else:
+            node.location = (name, line)
+
     def unhandled_element(self, name, attrs):
         """ Handler for element nodes where a real handler is not
         found.
@@ -203,11 +260,15 @@ class GCCXMLParser(object):
     #--------------------------------------------------------------------------
     def visit_Namespace(self, attrs):
         name = attrs['name']
-        members = attrs['members'].split()
+        members = self.link_items(attrs['members'].split())
         return c_ast.Namespace(name, members)
     
     def visit_File(self, attrs):
-        name = attrs['name']
+        # the locations of all nodes of the file share its name
+        name = sys.intern(attrs['name'])
+        self.files[attrs['id']] = name
+        for node, line in self.pending_locations.pop(attrs['id'], ()):
+            node.location = (name, line)
         return c_ast.File(name)
 
     def visit_Variable(self, attrs):
@@ -215,13 +276,17 @@ class GCCXMLParser(object):
         typ = attrs['type']
         context = attrs['context']
         init = attrs.get('init', None)
-        return c_ast.Variable(name, typ, context, init)
+        variable = c_ast.Variable(name, typ, context, init)
+        self.link(variable, 'typ', 'context')
+        return variable
 
     def visit_Typedef(self, attrs):
         name = attrs['name']
         typ = attrs['type']
         context = attrs['context']
-        return c_ast.Typedef(name, typ, context)
+        typedef = c_ast.Typedef(name, typ, context)
+        self.link(typedef, 'typ', 'context')
+        return typedef
    
     def visit_FundamentalType(self, attrs):
         name = attrs['name']
@@ -236,7 +301,9 @@ class GCCXMLParser(object):
         typ = attrs['type']
         size = attrs['size']
         align = attrs['align']
-        return c_ast.PointerType(typ, size, align)
+        pointer = c_ast.PointerType(typ, size, align)
+        self.link(pointer, 'typ')
+        return pointer
 
     visit_ReferenceType = visit_PointerType
    
@@ -251,13 +318,17 @@ class GCCXMLParser(object):
             max = '-1'
         min = int(min.rstrip('lu'))
         max = int(max.rstrip('lu'))
-        return c_ast.ArrayType(typ, min, max)
+        array = c_ast.ArrayType(typ, min, max)
+        self.link(array, 'typ')
+        return array
 
     def visit_CvQualifiedType(self, attrs):
         typ = attrs['type']
         const = attrs.get('const', None)
         volatile = attrs.get('volatile', None)
-        return c_ast.CvQualifiedType(typ, const, volatile)
+        cv = c_ast.CvQualifiedType(typ, const, volatile)
+        self.link(cv, 'typ')
+        return cv
  
     def visit_Function(self, attrs):
         name = attrs['name']
@@ -265,12 +336,16 @@ class GCCXMLParser(object):
         context = attrs['context']
         attributes = attrs.get('attributes', '').split()
         extern = attrs.get('extern')
-        return c_ast.Function(name, returns, context, attributes, extern)
+        func = c_ast.Function(name, returns, context, attributes, extern)
+        self.link(func, 'returns', 'context')
+        return func
 
     def visit_FunctionType(self, attrs):
         returns = attrs['returns']
         attributes = attrs.get('attributes', '').split()
-        return c_ast.FunctionType(returns, attributes)
+        func = c_ast.FunctionType(returns, attributes)
+        self.link(func, 'returns')
+        return func
   
     def visit_OperatorFunction(self, attrs):
         name = attrs['name']
@@ -279,7 +354,10 @@ class GCCXMLParser(object):
         attributes = attrs.get('attributes', '').split()
         extern = attrs.get('extern')
         #return c_ast.OperatorFunction(name, returns)
-        return c_ast.OperatorFunction(name, returns, context, attributes, extern)
+        func = c_ast.OperatorFunction(name, returns, context, attributes,
+                                      extern)
+        self.link(func, 'returns', 'context')
+        return func
 
     def visit_Argument(self, attrs):
         parent = self.context[-1]
@@ -287,6 +365,7 @@ class GCCXMLParser(object):
             typ = attrs['type']
             name = attrs.get('name')
             arg = c_ast.Argument(typ, name)
+            self.link(arg, 'typ')
             parent.add_argument(arg)
 
     def visit_Enumeration(self, attrs):
@@ -314,7 +393,10 @@ class GCCXMLParser(object):
         context = attrs['context']
         align = attrs['align']
         size = attrs.get('size')
-        return c_ast.Struct(name, align, members, context, bases, size)
+        struct = c_ast.Struct(name, align, self.link_items(members), context,
+                              self.link_items(bases), size)
+        self.link(struct, 'context')
+        return struct
 
     def visit_Class(self, attrs):
         name = attrs.get('name')
@@ -327,7 +409,11 @@ class GCCXMLParser(object):
         context = attrs['context']
         align = attrs['align']
         size = attrs.get('size')
-        return c_ast.Struct(name, align, members, context, bases, size) #TODO: Class
+        #TODO: Class
+        struct = c_ast.Struct(name, align, self.link_items(members), context,
+                              self.link_items(bases), size)
+        self.link(struct, 'context')
+        return struct
 
     
     def visit_Union(self, attrs):
@@ -339,7 +425,10 @@ class GCCXMLParser(object):
         context = attrs['context']
         align = attrs['align']
         size = attrs.get('size')
-        return c_ast.Union(name, align, members, context, bases, size)
+        union = c_ast.Union(name, align, self.link_items(members), context,
+                            self.link_items(bases), size)
+        self.link(union, 'context')
+        return union
 
     def visit_Field(self, attrs):
         name = attrs['name']
@@ -347,96 +436,15 @@ class GCCXMLParser(object):
         context = attrs['context']
         bits = attrs.get('bits', None)
         offset = attrs.get('offset')
-        return c_ast.Field(name, typ, context, bits, offset)
+        field = c_ast.Field(name, typ, context, bits, offset)
+        self.link(field, 'typ', 'context')
+        return field
 
 
     #visit_Class = visit_Struct
     #visit_Class = visit_Ignored
 
 
-    #--------------------------------------------------------------------------
-    # Fixup handlers
-    #--------------------------------------------------------------------------
-
-    # The fixup handlers use the ids save on the node attrs to lookup 
-    # the replacement node from the storage, then do the swapout. There
-    # must be a fixup handler (even if its pass-thru) for each node
-    # handler that returns a node object.
-    
-    def _fixup_Namespace(self, ns):
-        for i, mbr in enumerate(ns.members):
-            ns.members[i] = self.all[mbr]
-
-    def _fixup_File(self, f): 
-        pass
-    
-    def _fixup_Variable(self, t):
-        t.typ = self.all[t.typ]
-        t.context = self.all[t.context]
-
-    def _fixup_Typedef(self, t):
-        t.typ = self.all[t.typ]
-        t.context = self.all[t.context]
-
-    def _fixup_FundamentalType(self, t): 
-        pass
-
-    def _fixup_PointerType(self, p):
-        p.typ = self.all[p.typ]
-
-    _fixup_ReferenceType = _fixup_PointerType
-
-    def _fixup_ArrayType(self, a):
-        a.typ = self.all[a.typ]
-
-    def _fixup_CvQualifiedType(self, c):
-        c.typ = self.all[c.typ]
-
-    def _fixup_Function(self, func):
-        func.returns = self.all[func.returns]
-        func.context = self.all[func.context]
-        func.fixup_argtypes(self.all)
-        
-    def _fixup_FunctionType(self, func):
-        func.returns = self.all[func.returns]
-        func.fixup_argtypes(self.all)
-        
-    def _fixup_OperatorFunction(self, func):
-        func.returns = self.all[func.returns]
-        func.context = self.all[func.context]
-        func.fixup_argtypes(self.all)
-
-    def _fixup_Enumeration(self, e): 
-        pass
-
-    def _fixup_EnumValue(self, e): 
-        pass
-    
-    def _fixup_Struct(self, s):
-        s.members = [self.all[m] for m in s.members]
-        s.bases = [self.all[b] for b in s.bases]
-        s.context = self.all[s.context]
-
-    def _fixup_Union(self, u):
-        u.members = [self.all[m] for m in u.members]
-        u.bases = [self.all[b] for b in u.bases]
-        u.context = self.all[u.context]
-
-    def _fixup_Field(self, f):
-        f.typ = self.all[f.typ]
-        f.context = self.all[f.context]
-
-    def _fixup_Macro(self, m):
-        pass
-    
-    def _fixup_Ignored(self, const): 
-        pass
-
-    _fixup_Method = _fixup_Ignored
-    _fixup_Constructor = _fixup_Ignored
-    _fixup_Destructor = _fixup_Ignored
-    _fixup_OperatorMethod = _fixup_Ignored
-   
     #--------------------------------------------------------------------------
     # Post parsing helpers
     #--------------------------------------------------------------------------
@@ -501,25 +509,12 @@ class GCCXMLParser(object):
         # Gather any macros.
         self.get_macros(self.cpp_data.get('functions'))
 
-        # Walk through all the items, hooking up the appropriate 
-        # links by replacing the id tags with the actual objects
-        remove = []
-        for name, node in list(self.all.items()):
-            location = getattr(node, 'location', None)
-            if location is not None:
-                fil, line = location.split(':')
-                node.location = (self.all[fil].name, int(line))
-            method_name = '_fixup_' + node.__class__.__name__
-            fixup_method = getattr(self, method_name, None)
-            if fixup_method is not None:
-                fixup_method(node)
-            else:
-                remove.append(node)
-        
-        # remove any nodes don't have handler methods
-        for n in remove:
-            del self.all[n]
-               
+        # All references were hooked up while parsing, unless the xml
+        # refers to elements it doesn't contain.
+        if self.pending:
+            warnings.warn('Unresolved ids in the gccxml output: %s'
+                          % ' '.join(sorted(self.pending)))
+
         # sub out any #define'd aliases and collect all the nodes 
         # we're interested in. The interesting nodes are not necessarily
         # all nodes, but rather the ones that may need to be modified
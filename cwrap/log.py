@@ -0,0 +1,45 @@
+""" Logging for cwrap.
+
+All cwrap modules log to children of the `cwrap` logger, which is silent
+unless `set_verbosity` (or the `verbose` option of Config) turns it on.
+
+"""
+import logging
+
+
+logger = logging.getLogger('cwrap')
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.WARNING)
+
+_handler = None
+
+
+def get_logger(name):
+    """ Returns the logger for the cwrap module `name`.
+
+    """
+    return logging.getLogger(name)
+
+
+def set_verbosity(verbose):
+    """ Sets how much cwrap reports on stderr: 0 (or False) is silent,
+    1 (or True) reports progress and libclang diagnostics, 2 and above
+    traces every parsed cursor and converted type.
+
+    """
+    global _handler
+    if not verbose:
+        logger.setLevel(logging.WARNING)
+        if _handler is not None:
+            logger.removeHandler(_handler)
+            _handler = None
+        return
+
+    if verbose == 1:
+        logger.setLevel(logging.INFO)
+    else:
+        logger.setLevel(logging.DEBUG)
+    if _handler is None:
+        _handler = logging.StreamHandler()
+        _handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(_handler)
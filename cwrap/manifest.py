@@ -0,0 +1,109 @@
+""" The manifest of the incremental mode of Config.generate().
+
+For every header it records the options it was generated with, the
+contents hash of every input file (the header and everything it
+includes) and the hash of every file written for it. A header whose
+record still matches is not parsed, transformed or rendered again.
+
+"""
+# Stdlib imports
+import hashlib
+import json
+import os
+import tempfile
+
+
+MANIFEST_NAME = '.cwrap-manifest.json'
+
+# Bump whenever the layout of the manifest changes
+MANIFEST_VERSION = 1
+
+
+def file_digest(path):
+    """ Returns the sha1 of the contents of `path`.
+
+    """
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class Manifest(object):
+    """ The manifest of the files generated into a save dir.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._file_digests = {}
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if data.get('version') == MANIFEST_VERSION:
+            self.entries = data['files']
+
+    def file_digest(self, path):
+        """ Returns the sha1 of the contents of `path` or None if it
+        can't be read.
+
+        """
+        try:
+            return self._file_digests[path]
+        except KeyError:
+            pass
+        try:
+            digest = file_digest(path)
+        except (IOError, OSError):
+            digest = None
+        self._file_digests[path] = digest
+        return digest
+
+    def is_current(self, header, options):
+        """ Returns True if the files generated for `header` with the
+        options key `options` are up to date.
+
+        """
+        entry = self.entries.get(header)
+        if entry is None or entry['options'] != options:
+            return False
+        for path, digest in entry['inputs'].items():
+            if self.file_digest(path) != digest:
+                return False
+        # outputs that were deleted or edited are generated again
+        for path, digest in entry['outputs'].items():
+            if self.file_digest(path) != digest:
+                return False
+        return True
+
+    def record(self, header, options, inputs, outputs):
+        """ Records that the files `outputs` (a dict mapping their paths
+        to the sha1 of their contents) were generated for `header` from
+        the files `inputs`.
+
+        """
+        self._file_digests.update(outputs)
+        self.entries[header] = {
+            'options': options,
+            'inputs': dict((path, self.file_digest(path))
+                           for path in inputs),
+            'outputs': outputs,
+        }
+
+    def save(self):
+        """ Writes the manifest, replacing the old one atomically.
+
+        """
+        data = {'version': MANIFEST_VERSION, 'files': self.entries}
+        dirname = os.path.dirname(self.path)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
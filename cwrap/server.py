@@ -0,0 +1,208 @@
+""" A long-running cwrap process serving generate requests.
+
+`cwrap serve` listens on a Unix socket. Clients (e.g. `cwrap --socket`
+in a build) send one request per line, a JSON object with the keys
+
+* ``header``: the absolute path of the header to generate the code for
+* ``output``: the absolute path of the pxd file to write
+* ``header_name`` (optional): the name of the header in the ``cdef
+  extern from`` block, by default its file name
+* ``include_dirs`` (optional): the absolute include dirs of the header
+* ``language`` (optional): the source language, e.g. ``c++``
+
+and get one line back, a JSON object with either the key ``output`` (the
+path of the written file) or ``error``.
+
+The server keeps libclang loaded, and a Config with a clang Index and
+the translation units of the generated headers per set of options, so
+a header requested again is only reparsed if one of its files changed.
+Requests are served one at a time.
+
+"""
+# Stdlib imports
+import json
+import os
+import socket
+import socketserver
+import stat
+
+# Local package imports
+from .config import Config, File
+from .log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+DEFAULT_SOCKET = '.cwrap.sock'
+
+
+class ServerError(Exception):
+    """ Raised by the client when the server couldn't handle a request,
+    and by the server when it can't listen on its socket.
+
+    """
+
+
+def find_header(header, include_dirs):
+    """ Returns the path of `header`, searching the include dirs for a
+    relative path like ``#include <header>`` does.
+
+    """
+    if not os.path.isabs(header):
+        for include_dir in include_dirs:
+            path = os.path.join(include_dir, header)
+            if os.path.isfile(path):
+                return os.path.abspath(path)
+    return os.path.abspath(header)
+
+
+def header_file(path, header_name, output):
+    """ Returns the File generating the code of the header `path`,
+    called `header_name` in the extern block, into the pxd file
+    `output`, and the save dir of the Config for it.
+
+    """
+    save_dir, filename = os.path.split(os.path.abspath(output))
+    extern_name = os.path.splitext(filename)[0]
+    return (File(path, header_name=header_name, extern_name=extern_name,
+                 filename=filename),
+            save_dir)
+
+
+#------------------------------------------------------------------------------
+# Server
+#------------------------------------------------------------------------------
+def remove_stale_socket(path):
+    """ Removes the socket `path` left behind by a server which is gone.
+    Raises ServerError if `path` isn't a socket or a server is still
+    listening on it.
+
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ServerError('%s exists and is not a socket' % path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.remove(path)
+            return
+    raise ServerError('A server is already listening on %s' % path)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode())
+                response = {'output': self.server.generate(request)}
+            except Exception as e:
+                logger.exception('Request failed: %s', line)
+                response = {'error': '%s: %s' % (type(e).__name__, e)}
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+
+
+class Server(socketserver.UnixStreamServer):
+    """ Serves generate requests on the Unix socket `path`. The
+    `metadata` are the options of the Configs generating the code,
+    which are extended by the options of the requests.
+
+    """
+    def __init__(self, path, frontend='clang', **metadata):
+        remove_stale_socket(path)
+        socketserver.UnixStreamServer.__init__(self, path, RequestHandler)
+        self.frontend = frontend
+        self.metadata = metadata
+        self.metadata.setdefault('keep_translation_units', True)
+        # maps the options of the requests to their Config
+        self.configs = {}
+
+    def get_config(self, include_dirs, language):
+        """ Returns the Config generating the code for the options of a
+        request.
+
+        """
+        key = (tuple(include_dirs), language)
+        config = self.configs.get(key)
+        if config is None:
+            metadata = dict(self.metadata)
+            metadata['include_dirs'] = list(include_dirs)
+            metadata['language'] = language
+            config = Config(self.frontend, [], **metadata)
+            self.configs[key] = config
+        return config
+
+    def generate(self, request):
+        """ Generates the code for `request` (see the module docstring)
+        and returns the path of the written file.
+
+        """
+        include_dirs = request.get('include_dirs', [])
+        language = request.get('language', '')
+        header = request['header']
+        header_name = request.get('header_name', os.path.basename(header))
+
+        config = self.get_config(include_dirs, language)
+        header_file_, save_dir = header_file(header, header_name,
+                                             request['output'])
+        config.files = [header_file_]
+        config.save_dir = save_dir
+        config.generate()
+        return os.path.join(save_dir, header_file_.metadata['filename'])
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def serve(path=DEFAULT_SOCKET, frontend='clang', **metadata):
+    """ Serves generate requests on the Unix socket `path` until
+    interrupted.
+
+    """
+    server = Server(path, frontend, **metadata)
+    logger.info('Serving on %s', path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+#------------------------------------------------------------------------------
+# Client
+#------------------------------------------------------------------------------
+def request(path, header, output, include_dirs=(), language=''):
+    """ Asks the server listening on `path` to generate the code for
+    `header` into `output`. A relative `header` is searched in the
+    include dirs. Returns the path of the written file and raises
+    ServerError if the server failed, OSError if it can't be reached.
+
+    """
+    # the server may run in another directory
+    include_dirs = [os.path.abspath(d) for d in include_dirs]
+    message = {'header': find_header(header, include_dirs),
+               'header_name': header,
+               'output': os.path.abspath(output),
+               'include_dirs': include_dirs, 'language': language}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(message).encode() + b'\n')
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        raise ServerError('No response from %s' % path)
+    response = json.loads(line.decode())
+    if 'error' in response:
+        raise ServerError(response['error'])
+    return response['output']
@@ -0,0 +1,114 @@
+""" Regenerates the code of a Config whenever its inputs change.
+
+The Watcher generates in incremental mode, which records the files
+every header includes in the manifest of the save dir. It polls the
+modification times of the headers and of all those files, and once a
+change has settled for the debounce delay, generates again: only the
+pxd files of the headers affected by the change are regenerated, and
+the frontend reparses their kept translation units.
+
+"""
+# Stdlib imports
+import os
+import threading
+
+# Local package imports
+from .log import get_logger
+from .manifest import Manifest, MANIFEST_NAME
+
+
+logger = get_logger(__name__)
+
+
+def _stamps(paths):
+    stamps = {}
+    for path in paths:
+        try:
+            stamps[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+class Watcher(object):
+    """ Watches the inputs of `config`, polling them every `interval`
+    seconds. Code is generated again when no file changed for
+    `debounce` seconds after a change.
+
+    """
+    def __init__(self, config, interval=0.5, debounce=0.2):
+        self.config = config
+        self.interval = interval
+        self.debounce = debounce
+        config.metadata['incremental'] = True
+        config.metadata['keep_translation_units'] = True
+        self.stamps = {}
+
+    def watched_files(self):
+        """ Returns the paths of the headers of the config and of the
+        files they include.
+
+        """
+        manifest = Manifest(os.path.join(self.config.save_dir,
+                                         MANIFEST_NAME))
+        paths = set()
+        for header_file in self.config.files:
+            paths.add(header_file.path)
+            entry = manifest.entries.get(header_file.path)
+            if entry is not None:
+                paths.update(entry['inputs'])
+        return paths
+
+    def changed_files(self):
+        """ Returns the watched paths which changed since the last call
+        and updates the stamps.
+
+        """
+        stamps = _stamps(self.stamps)
+        changed = [path for path in stamps
+                   if stamps[path] != self.stamps[path]]
+        self.stamps = stamps
+        return changed
+
+    def generate(self):
+        """ Generates the code of the files affected by the changes and
+        starts watching the files they include now.
+
+        """
+        before = _stamps(self.watched_files())
+        try:
+            self.config.generate()
+        except Exception:
+            # e.g. a header saved half edited, the next change fixes it
+            logger.exception('Generating the code failed')
+        stamps = _stamps(self.watched_files())
+        # files changed while generating are seen as changed by the
+        # next poll
+        stamps.update((path, before[path]) for path in stamps
+                      if path in before)
+        self.stamps = stamps
+
+    def run(self, stop=None):
+        """ Generates the code and then again after every change, until
+        the threading.Event `stop` is set.
+
+        """
+        if stop is None:
+            stop = threading.Event()
+        self.generate()
+        while not stop.wait(self.interval):
+            changed = self.changed_files()
+            if not changed:
+                continue
+            # wait until no file changed for `debounce` seconds, e.g.
+            # until an editor saved all of them
+            while True:
+                if stop.wait(self.debounce):
+                    return
+                more = self.changed_files()
+                if not more:
+                    break
+                changed.extend(more)
+            logger.info('%s changed, generating again',
+                        ', '.join(sorted(set(changed))))
+            self.generate()
@@ -0,0 +1,47 @@
+""" Fixtures shared by the tests.
+
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+
+def bump_mtime(path):
+    """ Moves the modification time of `path` a second ahead, so a
+    rewritten file is noticed as changed even on file systems with
+    coarse timestamps.
+
+    """
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+class TempDirTestCase(unittest.TestCase):
+    """ A test case with a fresh temporary directory `tmpdir`, which is
+    removed after the test.
+
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def write(self, name, contents, touch=False):
+        """ Writes `contents` to the file `name` in `tmpdir` and returns
+        its path. With `touch`, the modification time is moved ahead
+        (see bump_mtime).
+
+        """
+        path = self.path(name)
+        with open(path, 'w') as f:
+            f.write(contents)
+        if touch:
+            bump_mtime(path)
+        return path
+
+    def read(self, name):
+        with open(self.path(name)) as f:
+            return f.read()
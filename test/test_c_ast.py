@@ -0,0 +1,47 @@
+import unittest
+
+from cwrap.frontends.clang import c_ast
+from cwrap.frontends.clang import clang_parser
+
+from helpers import TempDirTestCase
+
+
+HEADER = '''
+struct point { int x; int y; };
+typedef struct point point_t;
+int norm(point_t *p);
+'''
+
+
+class TestNodes(unittest.TestCase):
+
+    def test_slots(self):
+        node = c_ast.Struct(b'point', None)
+        with self.assertRaises(AttributeError):
+            node.extra = 1
+        self.assertIsNone(node.location)
+        node.location = (b'point.h', '2')
+        self.assertEqual(node.location, (b'point.h', 2))
+        node.location = None
+        self.assertIsNone(node.location)
+
+
+class TestLocations(TempDirTestCase):
+
+    def parse(self):
+        return clang_parser.parse([('point.h', HEADER)], [], '',
+                                  cache_dir=self.tmpdir)
+
+    def assert_shared(self, items):
+        names = set(id(item.location[0]) for item in items
+                    if item.location is not None)
+        self.assertEqual(len(names), 1)
+
+    def test_file_name_shared(self):
+        # parsed, then loaded from the cache
+        self.assert_shared(self.parse())
+        self.assert_shared(self.parse())
+
+
+if __name__ == '__main__':
+    unittest.main()
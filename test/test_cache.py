@@ -0,0 +1,68 @@
+import unittest
+
+from cwrap.frontends.clang import clang_parser
+
+from helpers import TempDirTestCase
+
+
+class TestParseCache(TempDirTestCase):
+
+    def setUp(self):
+        super(TestParseCache, self).setUp()
+        self.cache_dir = self.path('cache')
+        self.write('inner.h', '#ifndef INNER_H\n#define INNER_H\n'
+                              'struct inner { int a; };\n#endif\n')
+        self.write('outer.h', '#include "inner.h"\n'
+                              'struct outer { struct inner i; };\n')
+
+    def parse(self, prefix=None):
+        return clang_parser.parse(self.path('outer.h'), [], '', self.cache_dir,
+                                  prefix=prefix)
+
+    def build_prefix(self):
+        return clang_parser.build_prefix(
+            self.path('inner.h'), [], '', self.path('inner.pch'))
+
+    def names(self, items):
+        return [item.name for item in items]
+
+    def test_hit_skips_parser(self):
+        items = self.parse()
+        original_parse = clang_parser.ClangParser.parse
+        clang_parser.ClangParser.parse = None
+        try:
+            cached = self.parse()
+        finally:
+            clang_parser.ClangParser.parse = original_parse
+        self.assertEqual(self.names(items), self.names(cached))
+
+    def test_locations(self):
+        items = self.parse()
+        cached = self.parse()
+        self.assertEqual([item.location for item in items],
+                         [item.location for item in cached])
+        self.assertTrue(cached[-1].location[0].endswith(b'outer.h'))
+
+    def test_include_change_invalidates(self):
+        self.parse()
+        self.write('inner.h', 'struct inner { int a; };\n'
+                              'struct extra { int b; };\n')
+        items = self.parse()
+        self.assertIn(b'extra', self.names(items))
+
+    def test_prefix(self):
+        items = self.parse()
+        prefixed = self.parse(self.build_prefix())
+        self.assertEqual(sorted(self.names(items)),
+                         sorted(self.names(prefixed)))
+
+    def test_prefix_change_invalidates(self):
+        self.parse(self.build_prefix())
+        self.write('inner.h', 'struct inner { int a; };\n'
+                              'struct extra { int b; };\n')
+        items = self.parse(self.build_prefix())
+        self.assertIn(b'extra', self.names(items))
+
+
+if __name__ == '__main__':
+    unittest.main()
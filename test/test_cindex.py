@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from cwrap.frontends.clang.clang import cindex
+
+
+HEADER = '''
+struct point { int x; int y; };
+int norm(struct point *p);
+'''
+
+
+class TestCursorSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tu = cindex.TranslationUnit.from_source(
+            'snap.h', unsaved_files=[('snap.h', HEADER)])
+
+    def cursors(self, cursor=None):
+        cursors = []
+        for child in (cursor or self.tu.cursor).get_children():
+            if child.location.file is not None:
+                cursors.append(child)
+                cursors += self.cursors(child)
+        return cursors
+
+    def test_same_as_cursor(self):
+        cursors = self.cursors()
+        self.assertTrue(cursors)
+        for cursor in cursors:
+            info = cursor.snapshot()
+            self.assertIs(info.kind, cursor.kind)
+            self.assertEqual(info.spelling, cursor.spelling)
+            self.assertEqual(info.file_name, cursor.location.file.name)
+            self.assertEqual(info.line, cursor.location.line)
+        # the file name is looked up once
+        names = set(id(cursor.snapshot().file_name) for cursor in cursors)
+        self.assertEqual(len(names), 1)
+
+    def test_builtin(self):
+        self.assertIsNone(self.tu.cursor.snapshot().file_name)
+
+    def test_reparse(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'snap.h')
+        with open(path, 'w') as f:
+            f.write(HEADER)
+        # the translation unit doesn't keep its index alive
+        index = cindex.Index.create()
+        self.tu = index.parse(path)
+        self.assertEqual(self.cursors()[0].snapshot().line, 2)
+
+        with open(path, 'w') as f:
+            f.write('\n' + HEADER)
+        self.tu.reparse()
+        info = self.cursors()[0].snapshot()
+        self.assertEqual(info.file_name, os.fsencode(path))
+        self.assertEqual(info.line, 3)
+
+
+class TestChildrenMap(unittest.TestCase):
+
+    def setUp(self):
+        header = ''.join('struct s%d { int a; struct s%d *next; };\n'
+                         'int f%d(struct s%d *s);\n' % (i, i, i, i)
+                         for i in range(500))
+        self.tu = cindex.TranslationUnit.from_source(
+            'many.h', unsaved_files=[('many.h', header)])
+
+    def test_single_pass(self):
+        lib = cindex.conf.lib
+        calls = []
+        visit_children = lib.clang_visitChildren
+        def counting(*args):
+            calls.append(args)
+            return visit_children(*args)
+        lib.clang_visitChildren = counting
+        try:
+            children = self.tu.cursor.get_children_map(
+                [cindex.CursorKind.STRUCT_DECL])
+        finally:
+            lib.clang_visitChildren = visit_children
+        self.assertEqual(len(calls), 1)
+
+        key = cindex.cursor_key
+        toplevel = children[key(self.tu.cursor)]
+        structs = [c for c in toplevel
+                   if c.kind is cindex.CursorKind.STRUCT_DECL]
+        self.assertEqual(len(structs), 500)
+        self.assertEqual(len(children), 501)
+        # the same children as get_children
+        for cursor in [self.tu.cursor] + structs[:10]:
+            self.assertEqual([key(c) for c in children[key(cursor)]],
+                             [key(c) for c in cursor.get_children()])
+        self.assertEqual([c.spelling for c in children[key(structs[0])]],
+                         [b'a', b'next'])
+
+    def test_keys_unique(self):
+        cursors = []
+        def walk(cursor):
+            for child in cursor.get_children():
+                cursors.append(child)
+                walk(child)
+        walk(self.tu.cursor)
+        declarations = [c for c in cursors if c.kind.is_declaration()]
+        keys = set(cindex.cursor_key(c) for c in declarations)
+        self.assertEqual(len(keys), len(declarations))
+
+        # the declaration a type refers to has the key of its cursor
+        struct = next(self.tu.cursor.get_children())
+        field = list(struct.get_children())[1]
+        pointee = field.type.get_pointee().get_declaration()
+        self.assertEqual(cindex.cursor_key(pointee), cindex.cursor_key(struct))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import json
+import os
+import unittest
+
+from cwrap import cli
+from cwrap.config import Config, File
+from cwrap.frontends.clang import compdb
+
+from helpers import TempDirTestCase, bump_mtime
+
+
+class TestCompileCommands(TempDirTestCase):
+
+    def setUp(self):
+        super(TestCompileCommands, self).setUp()
+        self.build_dir = self.path('build')
+        os.mkdir(self.build_dir)
+        os.mkdir(self.path('inc'))
+        self.write('inc/dep.h', 'typedef int dep_t;\n')
+        self.write('a.h', '#include "dep.h"\n'
+                          '#ifdef FOO\n'
+                          'dep_t foo(void);\n'
+                          '#else\n'
+                          'dep_t bar(void);\n'
+                          '#endif\n')
+        self.write('b.h', '#include "dep.h"\n'
+                          'dep_t baz(void);\n')
+        self.write_commands([
+            {'directory': self.build_dir,
+             'command': 'cc -DFOO -I../inc -c ../a.c -o a.o -MD -MF a.d',
+             'file': '../a.c'},
+            {'directory': self.build_dir,
+             'arguments': ['cc', '-I', '../inc', '-c', '../b.c'],
+             'file': '../b.c'},
+        ])
+
+    def write_commands(self, commands):
+        with open(os.path.join(self.build_dir, compdb.DATABASE_NAME),
+                  'w') as f:
+            json.dump(commands, f)
+
+    def test_header_args(self):
+        flags = compdb.CompileFlags(self.build_dir)
+        inc = self.path('inc')
+        self.assertEqual(flags.header_args(self.path('a.h')),
+                         ['-DFOO', '-I' + inc])
+        self.assertEqual(flags.header_args(self.path('b.h')),
+                         ['-I', inc])
+
+    def test_path_args(self):
+        self.write_commands([
+            {'directory': self.build_dir,
+             'arguments': ['cc', '-include-pch', 'pre.pch', '-include',
+                           'config.h', '-includeother.h', '-isystem../sys',
+                           '-iprefix', '../pre/', '-iwithprefix', 'inc',
+                           '-isystem-after', 'after', '--sysroot=../root',
+                           '-x', 'c', '-c', '../a.c'],
+             'file': '../a.c'}])
+        flags = compdb.CompileFlags(self.build_dir)
+        self.assertEqual(flags.header_args(self.path('a.h')), [
+            '-include', os.path.join(self.build_dir, 'config.h'),
+            '-include' + os.path.join(self.build_dir, 'other.h'),
+            '-isystem' + self.path('sys'),
+            '-iprefix', self.path('pre') + os.sep, '-iwithprefix', 'inc',
+            '-isystem-after', 'after', '--sysroot=' + self.path('root'),
+            '-x', 'c'])
+
+    def test_no_command(self):
+        os.mkdir(self.path('other'))
+        header = self.path(os.path.join('other', 'c.h'))
+        flags = compdb.CompileFlags(self.build_dir)
+        with self.assertLogs('cwrap.frontends.clang.compdb', 'INFO') as logs:
+            self.assertEqual(flags.header_args(header), [])
+        self.assertIn('without flags', logs.output[0])
+
+    def test_same_name(self):
+        for name in ['lib', 'tools', 'include', 'src']:
+            os.mkdir(self.path(name))
+        commands = [
+            {'directory': self.build_dir,
+             'command': 'cc -DTOOLS -c ../tools/config.c',
+             'file': '../tools/config.c'},
+            {'directory': self.build_dir,
+             'command': 'cc -DLIB -c ../lib/x.c', 'file': '../lib/x.c'},
+            {'directory': self.build_dir,
+             'command': 'cc -DSRC_TOOLS -c ../src/tools/config.c',
+             'file': '../src/tools/config.c'},
+            {'directory': self.build_dir,
+             'command': 'cc -DSRC -c ../src/config.c',
+             'file': '../src/config.c'},
+        ]
+        self.write_commands(commands)
+        flags = compdb.CompileFlags(self.build_dir)
+        # a source of the header's directory comes first
+        self.assertEqual(flags.header_args(self.path('lib/config.h')),
+                         ['-DLIB'])
+        # then the closest source with the same name, not the first one
+        header = self.path(os.path.join('src', 'tools', 'inc', 'config.h'))
+        self.assertEqual(flags.header_args(header), ['-DSRC_TOOLS'])
+        self.assertEqual(flags.header_args(self.path('include/config.h')),
+                         ['-DSRC'])
+
+        self.write_commands(commands + [
+            {'directory': self.build_dir,
+             'command': 'cc -DLIB_CONFIG -c ../lib/config.c',
+             'file': '../lib/config.c'}])
+        flags = compdb.CompileFlags(self.build_dir)
+        self.assertEqual(flags.header_args(self.path('lib/config.h')),
+                         ['-DLIB_CONFIG'])
+        self.assertEqual(flags.header_args(self.path('lib/other.h')),
+                         ['-DLIB'])
+
+    def test_generate(self):
+        files = [File(self.path(name)) for name in ['a.h', 'b.h']]
+        config = Config('clang', files, self.tmpdir,
+                        compile_commands=self.build_dir)
+        config.generate()
+        self.assertIn('dep_t foo()', self.read('_a.pxd'))
+        self.assertNotIn('bar', self.read('_a.pxd'))
+        self.assertIn('dep_t baz()', self.read('_b.pxd'))
+
+    def test_file_args(self):
+        files = [File(self.path('b.h'), args=['-DFOO'])]
+        self.write('b.h', '#include "dep.h"\n'
+                          '#ifdef FOO\n'
+                          'dep_t foo(void);\n'
+                          '#endif\n')
+        config = Config('clang', files, self.tmpdir,
+                        compile_commands=self.build_dir)
+        config.generate()
+        self.assertIn('dep_t foo()', self.read('_b.pxd'))
+
+    def test_incremental(self):
+        path = self.path('a.h')
+        config = Config('clang', [File(path)], self.tmpdir,
+                        compile_commands=self.build_dir, incremental=True)
+        config.generate()
+        self.assertIn('foo', self.read('_a.pxd'))
+
+        # a changed database generates the header again
+        self.write_commands([
+            {'directory': self.build_dir,
+             'command': 'cc -I../inc -c ../a.c', 'file': '../a.c'}])
+        bump_mtime(os.path.join(self.build_dir, compdb.DATABASE_NAME))
+        config = Config('clang', [File(path)], self.tmpdir,
+                        compile_commands=self.build_dir, incremental=True)
+        config.generate()
+        self.assertIn('bar', self.read('_a.pxd'))
+
+    def test_batch(self):
+        output_dir = self.path('out')
+        os.mkdir(output_dir)
+        self.assertEqual(cli.main(['batch', '-p', self.build_dir,
+                                   '-o', output_dir, '-j', '2',
+                                   self.path('a.h'),
+                                   self.path('b.h')]), 0)
+        with open(os.path.join(output_dir, '_a.pxd')) as f:
+            self.assertIn('dep_t foo()', f.read())
+        with open(os.path.join(output_dir, '_b.pxd')) as f:
+            self.assertIn('dep_t baz()', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import contextlib
+import glob
+import io
+import logging
+import os
+import unittest
+
+from cwrap import frontends, log
+from cwrap.backend import renderer
+from cwrap.config import Config, File
+
+from helpers import TempDirTestCase
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+class TestJobs(TempDirTestCase):
+
+    def generate(self, jobs):
+        files = [File(path)
+                 for path in sorted(glob.glob(os.path.join(DATA_DIR, '*.h')))]
+        save_dir = self.path('jobs%d' % jobs)
+        os.mkdir(save_dir)
+        config = Config('clang', files, save_dir, jobs=jobs)
+        frontend = frontends.get_frontend('clang')
+        order = [ast_container.filename
+                 for ast_container in frontend.generate_asts(config)]
+        config.generate()
+        outputs = []
+        for filename in order:
+            with open(os.path.join(save_dir, filename), 'rb') as f:
+                outputs.append(f.read())
+        return order, outputs
+
+    def test_same_as_serial(self):
+        order, outputs = self.generate(1)
+        self.assertGreater(len(order), 2)
+        self.assertEqual(self.generate(2), (order, outputs))
+
+
+class TestPrefix(TempDirTestCase):
+
+    def test_prefix_header_generated(self):
+        # no include guard, the prefix must not be included into itself
+        prefix = self.write('enum.h', 'typedef enum { FOO, BAR } some_enum;\n')
+        other = self.write('other.h', 'some_enum get(void);\n')
+        Config('clang', [File(prefix), File(other)], self.tmpdir,
+               prefix_header=prefix).generate()
+        self.assertEqual(self.read('_enum.pxd').count('some_enum'), 1)
+        self.assertIn('some_enum get()', self.read('_other.pxd'))
+
+
+class TestOutput(TempDirTestCase):
+
+    def generate(self):
+        header = self.write('out.h', 'int f(int);\n')
+        Config('clang', [File(header)], self.tmpdir).generate()
+
+    def test_render_error(self):
+        def render_to(ast_renderer, module, stream):
+            stream.write('# half')
+            raise RuntimeError('render failed')
+        original_render_to = renderer.ASTRenderer.render_to
+        renderer.ASTRenderer.render_to = render_to
+        try:
+            with self.assertRaises(RuntimeError):
+                self.generate()
+            self.assertEqual(os.listdir(self.tmpdir), ['out.h'])
+
+            # an existing output is kept as it is
+            renderer.ASTRenderer.render_to = original_render_to
+            self.generate()
+            code = self.read('_out.pxd')
+            renderer.ASTRenderer.render_to = render_to
+            with self.assertRaises(RuntimeError):
+                self.generate()
+        finally:
+            renderer.ASTRenderer.render_to = original_render_to
+        self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                         ['_out.pxd', 'out.h'])
+        self.assertEqual(self.read('_out.pxd'), code)
+
+
+class TestVerbose(TempDirTestCase):
+
+    def setUp(self):
+        super(TestVerbose, self).setUp()
+        self.header = self.write('v.h', 'int f(int);\n')
+
+    def generate(self, **metadata):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), \
+                contextlib.redirect_stderr(stderr):
+            Config('clang', [File(self.header)], self.tmpdir,
+                   **metadata).generate()
+            if 'verbose' in metadata:
+                # drop the handler writing to `stderr`
+                log.set_verbosity(0)
+        self.assertEqual(stdout.getvalue(), '')
+        return stderr.getvalue()
+
+    def test_levels(self):
+        self.assertEqual(self.generate(verbose=0), '')
+        self.assertEqual(self.generate(), '')
+
+        info = self.generate(verbose=1)
+        self.assertIn('Parsing %s' % self.header, info)
+        self.assertIn('Rendering', info)
+        self.assertNotIn('AST:', info)
+
+        debug = self.generate(verbose=2)
+        self.assertIn('Parsing %s' % self.header, debug)
+        self.assertIn('AST:', debug)
+
+    def test_application_logging_kept(self):
+        logger = logging.getLogger('cwrap')
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.INFO)
+
+        self.assertEqual(self.generate(), '')
+        self.assertIn('Parsing %s' % self.header, stream.getvalue())
+        self.assertIn(handler, logger.handlers)
+        self.assertEqual(logger.level, logging.INFO)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import io
+import unittest
+
+from cwrap.frontends.gccxml import c_ast, gccxml_parser
+
+
+# gccxml refers to elements defined further down, the File elements
+# come last
+XML = b'''<?xml version="1.0"?>
+<GCC_XML cvs_revision="1.135">
+  <Namespace id="_1" name="::" members="_3 _4 _6" mangled="_Z2::"/>
+  <Typedef id="_3" name="node_t" type="_4" context="_1" location="f1:3" file="f1" line="3"/>
+  <Struct id="_4" name="node" context="_1" mangled="4node" members="_5" bases="" size="64" align="64" location="f1:1" file="f1" line="1"/>
+  <Field id="_5" name="next" type="_7" context="_4" location="f1:2" file="f1" line="2"/>
+  <Function id="_6" name="first" returns="_7" context="_1" location="f1:4" file="f1" line="4">
+    <Argument name="n" type="_3"/>
+  </Function>
+  <PointerType id="_7" type="_4" size="64" align="64"/>
+  <File id="f1" name="node.h"/>
+</GCC_XML>
+'''
+
+
+class TestGCCXMLParser(unittest.TestCase):
+
+    def test_forward_references(self):
+        items = gccxml_parser.parse(io.BytesIO(XML))
+        nodes = dict((item.name, item) for item in items)
+        namespace, typedef, struct, function = [
+            nodes[name] for name in ['::', 'node_t', 'node', 'first']]
+
+        self.assertEqual(namespace.members, [typedef, struct, function])
+        self.assertIs(typedef.typ, struct)
+        field, = struct.members
+        self.assertIsInstance(field.typ, c_ast.PointerType)
+        self.assertIs(field.typ.typ, struct)
+        self.assertIs(field.context, struct)
+        self.assertIs(function.returns, field.typ)
+        self.assertIs(function.arguments[0].typ, typedef)
+
+        self.assertEqual(struct.location, ('node.h', 1))
+        self.assertEqual(function.location, ('node.h', 4))
+        # one file name shared by all the locations
+        self.assertIs(struct.location[0], function.location[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import unittest
+
+from cwrap import manifest
+from cwrap.config import Config, File
+from cwrap.frontends.clang import clang_parser
+
+from helpers import TempDirTestCase
+
+
+class TestIncremental(TempDirTestCase):
+
+    def setUp(self):
+        super(TestIncremental, self).setUp()
+        self.write('inner.h', 'struct inner { int a; };\n')
+        self.write('a.h', '#include "inner.h"\nstruct a { struct inner i; };\n')
+        self.write('b.h', 'int b(int x);\n')
+        self.parsed = []
+        self.original_parse = clang_parser.ClangParser.parse
+        parsed = self.parsed
+        original_parse = self.original_parse
+        def parse(parser, cfile, *args, **kwargs):
+            parsed.append(os.path.basename(cfile))
+            return original_parse(parser, cfile, *args, **kwargs)
+        clang_parser.ClangParser.parse = parse
+
+    def tearDown(self):
+        clang_parser.ClangParser.parse = self.original_parse
+
+    def generate(self, **metadata):
+        del self.parsed[:]
+        files = [File(self.path('a.h')), File(self.path('b.h'))]
+        Config('clang', files, save_dir=self.tmpdir, incremental=True,
+               **metadata).generate()
+        return sorted(self.parsed)
+
+    def test_unchanged_is_skipped(self):
+        self.assertEqual(self.generate(), ['a.h', 'b.h'])
+        mtime = os.stat(self.path('_a.pxd')).st_mtime_ns
+        self.assertEqual(self.generate(), [])
+        self.assertEqual(os.stat(self.path('_a.pxd')).st_mtime_ns, mtime)
+
+    def test_include_change(self):
+        self.generate()
+        self.write('inner.h', 'struct inner { int a; int b; };\n')
+        self.assertEqual(self.generate(), ['a.h'])
+
+    def test_option_change(self):
+        self.generate()
+        self.assertEqual(self.generate(include_dirs=[self.tmpdir]),
+                         ['a.h', 'b.h'])
+
+    def test_runtime_option_change(self):
+        self.generate()
+        # e.g. the server keeps the translation units
+        self.assertEqual(self.generate(keep_translation_units=True, jobs=2,
+                                       cache_dir=self.path('cache')), [])
+
+    def test_deleted_output(self):
+        self.generate()
+        os.remove(self.path('_b.pxd'))
+        self.assertEqual(self.generate(), ['b.h'])
+        self.assertTrue(os.path.exists(self.path('_b.pxd')))
+
+    def test_identical_output_not_rewritten(self):
+        self.generate()
+        mtime = os.stat(self.path('_b.pxd')).st_mtime_ns
+        self.write('b.h', '/* comment */\nint b(int x);\n')
+        self.assertEqual(self.generate(), ['b.h'])
+        self.assertEqual(os.stat(self.path('_b.pxd')).st_mtime_ns, mtime)
+
+    def test_not_incremental(self):
+        digested = []
+        original_digest = manifest.file_digest
+        def file_digest(path):
+            digested.append(path)
+            return original_digest(path)
+        manifest.file_digest = file_digest
+        try:
+            Config('clang', [File(self.path('b.h'))],
+                   save_dir=self.tmpdir).generate()
+        finally:
+            manifest.file_digest = original_digest
+        # the output isn't read again
+        self.assertEqual(digested, [])
+        self.assertTrue(os.path.exists(self.path('_b.pxd')))
+        self.assertFalse(os.path.exists(
+            self.path(manifest.MANIFEST_NAME)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from cwrap.config import Config, File
+from cwrap.frontends.clang import macros
+
+from helpers import TempDirTestCase
+
+
+HEADER = '''#include <stddef.h>
+#define ANSWER 42
+#define NEG (-1)
+#define MASK (1u << 3 | 0x10UL)
+#define PI 3.14
+#define NAME "a" "b"
+#define FUNC(x) ((x) + 1)
+#define ALIAS ANSWER
+#define EMPTY
+int f(int);
+'''
+
+
+class TestConstantKind(unittest.TestCase):
+
+    def test_kinds(self):
+        self.assertEqual(macros.constant_kind([b'0x1fUL']), macros.INTEGER)
+        self.assertEqual(macros.constant_kind([b'(', b'-', b'1', b')']),
+                         macros.INTEGER)
+        self.assertEqual(macros.constant_kind([b'1', b'/', b'2.0f']),
+                         macros.FLOAT)
+        self.assertEqual(macros.constant_kind([b'1e-3']), macros.FLOAT)
+        self.assertEqual(macros.constant_kind([b'"a"', b'L"b"']),
+                         macros.STRING)
+        self.assertIsNone(macros.constant_kind([b'"a"', b'1']))
+        self.assertIsNone(macros.constant_kind([b'ANSWER']))
+        self.assertIsNone(macros.constant_kind([b'(', b')']))
+        self.assertIsNone(macros.constant_kind([]))
+
+
+class TestMacros(TempDirTestCase):
+
+    def setUp(self):
+        super(TestMacros, self).setUp()
+        self.header = self.write('m.h', HEADER)
+
+    def generate(self, **metadata):
+        config = Config('clang', [File(self.header)], self.tmpdir, **metadata)
+        config.generate()
+        return self.read('_m.pxd')
+
+    def test_macros(self):
+        pxd = self.generate(macros=True)
+        self.assertIn('cdef enum:\n', pxd)
+        enum = pxd.split('cdef enum:\n', 1)[1]
+        self.assertEqual(enum.split()[:3], ['ANSWER', 'NEG', 'MASK'])
+        self.assertIn('const double PI', pxd)
+        self.assertIn('const char *NAME', pxd)
+        self.assertIn('int f(int)', pxd)
+        for name in ['FUNC', 'ALIAS', 'EMPTY', 'NULL']:
+            self.assertNotIn(name, pxd)
+
+    def test_source_order(self):
+        self.write('m.h', '#define A 1\nint foo(void);\n'
+                          '#define AFTER 2\n#define AFTER2 3\n')
+        pxd = self.generate(macros=True)
+        before, rest = pxd.split('int foo()', 1)
+        self.assertEqual(before.split('cdef enum:\n', 1)[1].split(), ['A'])
+        self.assertEqual(rest.split('cdef enum:\n', 1)[1].split(),
+                         ['AFTER', 'AFTER2'])
+
+    def test_off_by_default(self):
+        pxd = self.generate()
+        self.assertIn('int f(int)', pxd)
+        for name in ['ANSWER', 'PI', 'NAME', 'enum']:
+            self.assertNotIn(name, pxd)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+from cwrap.frontends.clang import c_ast
+from cwrap.frontends.clang import clang_parser
+
+
+HEADER = '''
+struct later;
+void use(struct later *p);
+struct later { int a; };
+'''
+
+
+class TestParseOnce(unittest.TestCase):
+
+    def setUp(self):
+        self.items = clang_parser.parse([('once.h', HEADER)], [], '')
+
+    def test_declaration_parsed_once(self):
+        # the definition of `struct later` is first parsed for the
+        # argument type of use(), the node must be reused afterwards
+        forward, definition = [item for item in self.items
+                               if isinstance(item, c_ast.Struct)]
+        self.assertEqual(len(definition.members), 1)
+        use, = [item for item in self.items
+                if isinstance(item, c_ast.Function)]
+        self.assertIs(use.arguments[0].typ.typ.typ, definition)
+
+
+if __name__ == '__main__':
+    unittest.main()
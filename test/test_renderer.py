@@ -0,0 +1,47 @@
+import io
+import os
+import unittest
+
+from cwrap import frontends
+from cwrap.backend import renderer
+from cwrap.config import Config, File
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+class TestRenderTo(unittest.TestCase):
+
+    def setUp(self):
+        self.files = [File(os.path.join(DATA_DIR, name))
+                      for name in ['enum.h', 'functionpointer_in_struct.h',
+                                   'struct_with_typedef_field.h']]
+        self.frontend = frontends.get_frontend('clang')
+
+    def test_same_as_render(self):
+        ast_renderer = renderer.ASTRenderer()
+        ast_containers = list(
+            self.frontend.generate_asts(Config('clang', self.files)))
+        self.assertEqual(len(ast_containers), len(self.files))
+        for ast_container in ast_containers:
+            code = ast_renderer.render(ast_container.module)
+            stream = io.StringIO()
+            ast_renderer.render_to(ast_container.module, stream)
+            self.assertIn('cdef extern from', code)
+            self.assertEqual(stream.getvalue(), code)
+
+    def test_lazy(self):
+        ast_renderer = renderer.ASTRenderer()
+        codes = [ast_renderer.render(ast_container.module)
+                 for ast_container in self.frontend.generate_asts(
+                     Config('clang', self.files))]
+        lazy = self.frontend.generate_asts(Config('clang', self.files),
+                                           lazy=True)
+        for ast_container, code in zip(lazy, codes):
+            extern = ast_container.module.body[0].value
+            self.assertNotIsInstance(extern.body, list)
+            self.assertEqual(ast_renderer.render(ast_container.module), code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from cwrap.frontends.clang import c_ast
+from cwrap.frontends.clang import clang_parser
+from cwrap.frontends.clang.scope import ScopePolicy
+
+from helpers import TempDirTestCase
+
+
+class TestScope(TempDirTestCase):
+
+    def setUp(self):
+        super(TestScope, self).setUp()
+        self.write('system.h', '#pragma GCC system_header\n'
+                               'struct sys { int s; };\n')
+        self.write('inner.h', 'struct inner { int a; };\n')
+        self.write('outer.h', '#include "system.h"\n'
+                              '#include "inner.h"\n'
+                              'int use(struct inner *i);\n')
+
+    def toplevel(self, scope):
+        items = clang_parser.parse(self.path('outer.h'),
+                                   [], '', scope=scope)
+        tu, = [item for item in items if isinstance(item, c_ast.File)]
+        return dict((item.name, item) for item in tu.members)
+
+    def test_no_policy(self):
+        self.assertEqual(sorted(self.toplevel(None)),
+                         [b'inner', b'sys', b'use'])
+
+    def test_skip_system_headers(self):
+        scope = ScopePolicy(skip_system_headers=True)
+        self.assertEqual(sorted(self.toplevel(scope)), [b'inner', b'use'])
+
+    def test_include(self):
+        scope = ScopePolicy(include=['*/system.h'])
+        self.assertEqual(sorted(self.toplevel(scope)), [b'sys', b'use'])
+
+    def test_exclude_keeps_dependencies(self):
+        scope = ScopePolicy(exclude=['*/inner.h'])
+        toplevel = self.toplevel(scope)
+        self.assertEqual(sorted(toplevel), [b'sys', b'use'])
+        # struct inner is still parsed for the argument of use()
+        inner = toplevel[b'use'].arguments[0].typ.typ.typ
+        self.assertIsInstance(inner, c_ast.Struct)
+        self.assertEqual(inner.name, b'inner')
+
+    def test_allow(self):
+        scope = ScopePolicy(skip_system_headers=True, exclude=['*/inner.h'],
+                            allow=['*/system.h', '*/inner.h'])
+        self.assertEqual(sorted(self.toplevel(scope)),
+                         [b'inner', b'sys', b'use'])
+
+    def test_dependency_closure(self):
+        self.write('inner.h', 'typedef unsigned int size_type;\n'
+                              'struct unused { int u; };\n'
+                              'struct inner { size_type n; };\n')
+        scope = ScopePolicy(closure=True)
+        items = clang_parser.parse(self.path('outer.h'),
+                                   [], '', scope=scope)
+        tu, = [item for item in items if isinstance(item, c_ast.File)]
+        # only what use() depends on, declared before it
+        self.assertEqual([item.name for item in tu.members],
+                         [b'size_type', b'inner', b'use'])
+        self.assertIs(tu.members[1].context, tu)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import socket
+import threading
+import unittest
+
+from cwrap import cli, server
+
+from helpers import TempDirTestCase
+
+
+class TestServer(TempDirTestCase):
+
+    def setUp(self):
+        super(TestServer, self).setUp()
+        self.include_dir = self.path('inc')
+        os.mkdir(self.include_dir)
+        self.write('inner.h', 'struct inner { int a; };\n')
+        self.write('outer.h', '#include "inner.h"\n'
+                              'int use(struct inner *i);\n')
+        self.socket = self.path('cwrap.sock')
+        self.server = server.Server(self.socket)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+
+    def write(self, name, contents):
+        return super(TestServer, self).write(os.path.join('inc', name),
+                                             contents, touch=True)
+
+    def generate(self):
+        output = self.path('_outer.pxd')
+        path = server.request(self.socket, 'outer.h', output,
+                              [self.include_dir])
+        self.assertEqual(path, output)
+        with open(output) as f:
+            return f.read()
+
+    def test_generate(self):
+        code = self.generate()
+        self.assertIn('cdef extern from "outer.h"', code)
+        self.assertIn('int use(inner *i)', code)
+        # the same code as generated without the server
+        output = self.path('local.pxd')
+        self.assertEqual(cli.main(['-i', self.include_dir, 'outer.h',
+                                   output]), 0)
+        with open(output) as f:
+            self.assertEqual(f.read(), code)
+
+    def test_output_name(self):
+        # the output is written as named, like without a server
+        output = self.path('out.txt')
+        path = server.request(self.socket, 'outer.h', output,
+                              [self.include_dir])
+        self.assertEqual(path, output)
+        self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                         ['cwrap.sock', 'inc', 'out.txt'])
+        self.assertIn('int use(inner *i)', self.read('out.txt'))
+
+    def test_reparse(self):
+        self.assertNotIn('int b', self.generate())
+        tus = list(self.server.configs.values())[0].frontend_state['tus']
+        tu, = [entry[0] for entry in tus.entries.values()]
+
+        self.write('inner.h', 'struct inner { int a; int b; };\n')
+        self.assertIn('int b', self.generate())
+        # the translation unit was reparsed, not parsed again
+        self.assertEqual([entry[0] for entry in tus.entries.values()], [tu])
+
+    def test_error(self):
+        output = self.path('_missing.pxd')
+        with self.assertRaises(server.ServerError):
+            server.request(self.socket, 'missing.h', output,
+                           [self.include_dir])
+
+    def test_cli_without_server(self):
+        output = self.path('local.pxd')
+        socket = self.path('nobody.sock')
+        self.assertEqual(cli.main(['--socket', socket, '-i',
+                                   self.include_dir, 'outer.h', output]), 0)
+        self.assertTrue(os.path.exists(output))
+
+    def test_socket_in_use(self):
+        with self.assertRaises(server.ServerError):
+            server.Server(self.socket)
+        # the running server keeps its socket
+        self.assertIn('int use(inner *i)', self.generate())
+
+    def test_not_a_socket(self):
+        path = os.path.join(self.include_dir, 'outer.h')
+        with self.assertRaises(server.ServerError):
+            server.Server(path)
+        self.assertTrue(os.path.isfile(path))
+
+    def test_stale_socket(self):
+        path = self.path('stale.sock')
+        # bound, but nobody listens on it
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(path)
+        stale = server.Server(path)
+        stale.server_close()
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
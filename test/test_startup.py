@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from cwrap.frontends.clang import clang_parser
+from cwrap.frontends.clang.clang import cindex
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# modules a cwrap run only needs for some of the things it can do
+LAZY_MODULES = ['ctypes', 'multiprocessing', 'pkgutil', 'socket',
+                'cwrap.backend.renderer', 'cwrap.frontends.clang',
+                'cwrap.manifest', 'cwrap.server']
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_cli_imports(self):
+        code = ('import sys, cwrap.cli\n'
+                'print("\\n".join(sys.modules))')
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        modules = subprocess.check_output([sys.executable, '-c', code],
+                                          env=env).decode().split()
+        for name in LAZY_MODULES:
+            self.assertNotIn(name, modules)
+
+    def test_lazy_functions(self):
+        clang_parser.parse([('t.h', 'int f(int);')], [], '')
+        lib = cindex.conf.lib
+        self.assertIsInstance(lib, cindex.LazyLibrary)
+        self.assertIn('clang_visitChildren', vars(lib))
+        self.assertNotIn('clang_getCompletionBriefComment', vars(lib))
+        self.assertLess(len(vars(lib)), len(cindex.functionList))
+        with self.assertRaises(AttributeError):
+            lib.clang_noSuchFunction
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import unittest
+
+from cwrap.backend import cw_ast, renderer
+from cwrap.frontends.clang import ast_transforms, c_ast, clang_parser
+
+
+DATA = os.path.join(os.path.dirname(__file__), 'data')
+
+
+class TestLazyTransform(unittest.TestCase):
+
+    def render(self, filename, lazy):
+        items = clang_parser.parse(os.path.join(DATA, filename), [], '')
+        items = ast_transforms.apply_c_ast_transformations(items)
+        container = ast_transforms.CAstContainer(items, filename, '_test',
+                                                 'test')
+        transformer = ast_transforms.CAstTransformer([container], lazy)
+        ast_container, = transformer.transform()
+        extern = ast_container.module.body[0].value
+        self.assertIsInstance(extern, cw_ast.ExternFrom)
+        self.assertEqual(isinstance(extern.body, list), not lazy)
+        return renderer.ASTRenderer().render(ast_container.module)
+
+    def test_same_code(self):
+        for filename in ['struct_with_functionpointer.h', 'enum.h',
+                         'union_in_and_with_struct.h']:
+            self.assertEqual(self.render(filename, False),
+                             self.render(filename, True))
+
+
+class TestDispatch(unittest.TestCase):
+
+    def test_subclass_override(self):
+        class EnumRenderer(renderer.ASTRenderer):
+            def visit_EnumDef(self, enum_def):
+                self.code.write_i('# enum %s' % enum_def.name)
+                self.code.newline()
+
+        items = clang_parser.parse(os.path.join(DATA, 'enum.h'), [], '')
+        items = ast_transforms.apply_c_ast_transformations(items)
+        container = ast_transforms.CAstContainer(items, 'enum.h', '_test',
+                                                 'test')
+        ast_container, = ast_transforms.CAstTransformer([container]).transform()
+        code = EnumRenderer().render(ast_container.module)
+        self.assertIn('# enum some_enum', code)
+        self.assertNotIn('# enum', renderer.ASTRenderer().render(
+            ast_container.module))
+
+
+class TestFlatten(unittest.TestCase):
+
+    def test_nested_unions(self):
+        outer = c_ast.Struct('regs', members=[])
+        fields = []
+        for i in range(3):
+            union = c_ast.Union('u%d' % i, context=outer)
+            union.members = [c_ast.Field('r', c_ast.FundamentalType('int'),
+                                         union)]
+            field = c_ast.Field('u%d' % i, union, outer)
+            outer.members += [union, field]
+            fields.append(field)
+        items = ast_transforms.flatten_nested_containers([outer])
+        self.assertEqual([item.name for item in items],
+                         ['__regs_u0', '__regs_u0_t', '__regs_u1',
+                          '__regs_u1_t', '__regs_u2', '__regs_u2_t',
+                          'regs'])
+        self.assertEqual(outer.members, fields)
+        self.assertEqual([field.typ for field in fields], items[1:-1:2])
+
+    def test_remove_member(self):
+        nodes = [c_ast.Struct('a'), c_ast.Struct('b')]
+        members = list(nodes)
+        c_ast.remove_member(members, nodes[0])
+        self.assertEqual(members, nodes[1:])
+        with self.assertRaises(ValueError):
+            c_ast.remove_member(members, nodes[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+from cwrap.frontends.clang.clang import cindex
+from cwrap.frontends.clang.clang_parser import ClangParser
+from cwrap.frontends.clang.tu_cache import TranslationUnitCache
+
+from helpers import TempDirTestCase
+
+
+class SpyIndex(object):
+    """ An Index recording the options of the translation units it
+    parses.
+
+    """
+    def __init__(self):
+        self.index = cindex.Index.create()
+        self.options = []
+
+    def parse(self, path, **kwargs):
+        self.options.append(kwargs['options'])
+        return self.index.parse(path, **kwargs)
+
+
+class TestTranslationUnitCache(TempDirTestCase):
+
+    def setUp(self):
+        super(TestTranslationUnitCache, self).setUp()
+        self.write('inner.h', 'struct inner { int a; };\n')
+        self.header = self.write('outer.h', '#include "inner.h"\n'
+                                            'int one(struct inner *i);\n')
+        self.index = SpyIndex()
+        self.tus = TranslationUnitCache(self.index)
+        self.reparsed = []
+        reparse = cindex.TranslationUnit.reparse
+        def spy_reparse(tu, *args, **kwargs):
+            self.reparsed.append(tu)
+            return reparse(tu, *args, **kwargs)
+        cindex.TranslationUnit.reparse = spy_reparse
+        self.addCleanup(setattr, cindex.TranslationUnit, 'reparse', reparse)
+
+    def parse(self):
+        return self.tus.parse(self.header, ['-xc'],
+                              ClangParser.parse_options)
+
+    def names(self, tu):
+        return [c.spelling for c in tu.cursor.get_children()
+                if c.location.file is not None]
+
+    def test_reparse(self):
+        tu = self.parse()
+        options, = self.index.options
+        self.assertTrue(
+            options & cindex.TranslationUnit.PARSE_PRECOMPILED_PREAMBLE)
+        # reparsed once to build the preamble
+        self.assertEqual(self.reparsed, [tu])
+
+        self.assertIs(self.parse(), tu)
+        self.assertEqual(self.reparsed, [tu])
+
+        self.write('outer.h', '#include "inner.h"\n'
+                              'int one(struct inner *i);\n'
+                              'int two(struct inner *i);\n', touch=True)
+        self.assertIs(self.parse(), tu)
+        self.assertEqual(self.reparsed, [tu, tu])
+        self.assertEqual(len(self.index.options), 1)
+        self.assertEqual(self.names(tu), [b'inner', b'one', b'two'])
+
+        self.write('inner.h', 'struct inner { int a; };\n'
+                              'struct extra { int b; };\n', touch=True)
+        self.assertIs(self.parse(), tu)
+        self.assertEqual(self.names(tu), [b'inner', b'extra', b'one', b'two'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from cwrap.frontends.clang import c_ast
+from cwrap.frontends.clang import clang_parser
+
+
+HEADER = '''
+typedef int (*callback_t)(const char *name, int value);
+void set_a(callback_t cb, const char *name);
+void set_b(callback_t cb, const char *name);
+int call(int (*fn)(const char *name, int value));
+void put(char *name);
+'''
+
+
+class TestTypeCache(unittest.TestCase):
+
+    def setUp(self):
+        items = clang_parser.parse([('types.h', HEADER)], [], '')
+        self.functions = dict((item.name, item) for item in items
+                              if isinstance(item, c_ast.Function))
+
+    def arg_type(self, func, idx):
+        return self.functions[func].arguments[idx].typ
+
+    def test_same_type_is_shared(self):
+        self.assertIs(self.arg_type(b'set_a', 0), self.arg_type(b'set_b', 0))
+        self.assertIs(self.arg_type(b'set_a', 1), self.arg_type(b'set_b', 1))
+
+    def test_qualifiers_are_distinguished(self):
+        const_char = self.arg_type(b'set_a', 1).typ.typ
+        char = self.arg_type(b'put', 0).typ.typ
+        self.assertTrue(const_char.const)
+        self.assertFalse(char.const)
+        self.assertIsNot(const_char, char)
+
+    def test_function_type(self):
+        functype = self.arg_type(b'call', 0).typ.typ
+        self.assertIsInstance(functype, c_ast.FunctionType)
+        self.assertEqual(len(functype.arguments), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+import unittest
+
+from cwrap.config import Config, File
+from cwrap.watch import Watcher
+
+from helpers import TempDirTestCase
+
+
+class TestWatch(TempDirTestCase):
+
+    def setUp(self):
+        super(TestWatch, self).setUp()
+        self.write('inner.h', 'struct inner { int a; };\n')
+        self.write('outer.h', '#include "inner.h"\n'
+                              'int use(struct inner *i);\n')
+        self.write('other.h', 'int other(int);\n')
+        files = [File(self.path(name))
+                 for name in ['outer.h', 'other.h']]
+        self.watcher = Watcher(Config('clang', files, self.tmpdir),
+                               interval=0.02, debounce=0.02)
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.watcher.run,
+                                       args=(self.stop,))
+        self.thread.start()
+
+    def tearDown(self):
+        self.stop.set()
+        self.thread.join()
+
+    def write(self, name, contents):
+        return super(TestWatch, self).write(name, contents, touch=True)
+
+    def wait_for(self, name, text):
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                if text in self.read(name):
+                    return
+            except IOError:
+                pass
+            time.sleep(0.02)
+        self.fail('%r never appeared in %s' % (text, name))
+
+    def test_regenerate_on_include_change(self):
+        self.wait_for('_outer.pxd', 'int use(inner *i)')
+        self.wait_for('_other.pxd', 'int other(int)')
+        other_mtime = os.stat(self.path('_other.pxd')).st_mtime_ns
+
+        self.write('inner.h', 'struct inner { int a; int b; };\n')
+        self.wait_for('_outer.pxd', 'int b')
+        # the pxd file of the unaffected header isn't touched
+        self.assertEqual(
+            os.stat(self.path('_other.pxd')).st_mtime_ns,
+            other_mtime)
+
+
+if __name__ == '__main__':
+    unittest.main()